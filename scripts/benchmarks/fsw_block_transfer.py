@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+#
+# Benchmark RohdeSchwarzFSWBase.query_ieee_array against a local TCP socket
+# that stands in for the instrument. For each read chunk size, reports the
+# transfer rate and the peak resident memory above the idle baseline.
+#
+# Dependencies:
+#     ssmdevices, pyvisa-py, psutil
+
+import socket
+import threading
+import time
+
+import labbench as lb
+import numpy as np
+import psutil
+from ssmdevices.instruments import RohdeSchwarzFSW26RealTime
+
+# equivalent in size to a 1001-point spectrogram with 25,000 rows
+PAYLOAD_VALUES = 1001 * 25_000
+CHUNK_SIZES = (1 << 14, 1 << 16, 1 << 18, 1 << 20, 1 << 22, 1 << 24)
+REPEATS = 3
+
+
+def serve_blocks(listener: socket.socket, payload: bytes):
+    """answer every query on the connection with the same IEEE-488.2 block"""
+    size = str(len(payload)).encode()
+    header = b'#' + str(len(size)).encode() + size
+
+    conn, _ = listener.accept()
+    with conn:
+        pending = b''
+        while True:
+            buf = conn.recv(4096)
+            if not buf:
+                break
+            pending += buf
+            *lines, pending = pending.split(b'\n')
+            for line in lines:
+                if b'?' in line:
+                    conn.sendall(header)
+                    conn.sendall(payload)
+                    conn.sendall(b'\n')
+
+
+class PeakRSS:
+    """sample the resident memory of this process in a background thread"""
+
+    def __init__(self, interval=1e-3):
+        self.interval = interval
+        self.process = psutil.Process()
+
+    def __enter__(self):
+        self.peak = self.baseline = self.process.memory_info().rss
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def __exit__(self, *exc_info):
+        self._done.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+
+def run(sa, nbytes, **kws):
+    rates = []
+    peak = 0
+
+    for _ in range(REPEATS):
+        with PeakRSS() as mem:
+            t0 = time.perf_counter()
+            data = sa.query_ieee_array('TRAC2:DATA? SPEC', **kws)
+            elapsed = time.perf_counter() - t0
+            del data
+        rates.append(nbytes / elapsed / 1e6)
+        peak = max(peak, mem.peak - mem.baseline)
+
+    return np.median(rates), peak / 1e6
+
+
+if __name__ == '__main__':
+    payload = np.random.standard_normal(PAYLOAD_VALUES).astype('float32').tobytes()
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    port = listener.getsockname()[1]
+    threading.Thread(target=serve_blocks, args=(listener, payload), daemon=True).start()
+
+    lb.visa_default_resource_manager('@py')
+    sa = RohdeSchwarzFSW26RealTime(f'TCPIP0::127.0.0.1::{port}::SOCKET', timeout=30)
+
+    with sa:
+        print(f'payload: {len(payload)/1e6:0.1f} MB')
+        print(f'{"chunk (bytes)":>14} {"target":>8} {"MB/s":>9} {"peak RSS (MB)":>14}')
+
+        for chunk_size in CHUNK_SIZES:
+            sa.block_chunk_size = chunk_size
+
+            rate, peak = run(sa, len(payload))
+            print(f'{chunk_size:>14} {"new":>8} {rate:>9.1f} {peak:>14.1f}')
+
+            rate, peak = run(sa, len(payload), pool=True)
+            print(f'{chunk_size:>14} {"pool":>8} {rate:>9.1f} {peak:>14.1f}')
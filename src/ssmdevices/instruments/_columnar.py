@@ -0,0 +1,369 @@
+"""Compressed, columnar storage of spectrogram and trace data in Arrow IPC files"""
+
+import json
+from pathlib import Path
+import labbench as lb
+import typing
+from typing import Union
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+    import numpy as np
+    import pyarrow as pa
+else:
+    # delayed import for speed
+    pd = lb.util.lazy_import('pandas')
+    np = lb.util.lazy_import('numpy')
+
+__all__ = ['ArrowSpectrogram']
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError as ex:
+        raise ImportError(
+            'ArrowSpectrogram needs pyarrow; install it with `pip install ssmdevices[arrow]`'
+        ) from ex
+    return pyarrow
+
+
+class ArrowSpectrogram:
+    """An append-only spectrogram stored as compressed Arrow IPC files in a directory.
+
+    The data are divided into segments that each share one frequency axis and one
+    instrument state. The state (for example, from the `get_state_summary` method of
+    FSW drivers) is stored once per segment as metadata, instead of with each row. A
+    new segment begins at each call to `new_segment`, or when the frequency axis changes.
+
+    Each segment is a separate Arrow IPC file, divided into compressed record
+    batches of `batch_rows` rows with a 'time' column and a 'power' column of
+    fixed-size lists. A small JSON index of the time span of each batch allows
+    `read` to decompress only the batches in the requested time range. Each
+    segment file can be read once it is finished by `new_segment` or `close`.
+
+    Example::
+
+        with ArrowSpectrogram('capture', mode='w') as spg:
+            spg.new_segment(rtsa.get_state_summary())
+            rtsa.acquire_spectrogram_sequence(loop_time=3600, sink=spg)
+
+        spg = ArrowSpectrogram('capture')
+        df = spg.read(start=t0 + 60, stop=t0 + 120, fmin=2.40e9, fmax=2.48e9)
+
+    Arguments:
+        path: directory that contains the segment files
+        mode: 'r' to read, 'w' to create (clearing existing data), or 'a' to append to existing data
+        compression: Arrow IPC buffer compression codec ('zstd', 'lz4', or None)
+        batch_rows: the number of rows to buffer before writing each compressed record batch
+    """
+
+    INDEX_NAME = 'index.json'
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        mode: str = 'r',
+        compression: Union[str, None] = 'zstd',
+        batch_rows: int = 1024,
+    ):
+        if mode not in ('r', 'w', 'a'):
+            raise ValueError(f"mode must be 'r', 'w', or 'a', not {mode!r}")
+
+        self._pa = _import_pyarrow()
+        self.path = Path(path)
+        self.mode = mode
+        self.compression = compression
+        self.batch_rows = batch_rows
+
+        self._writer = None
+        self._pending = []
+        self._pending_rows = 0
+        self._state = {}
+
+        index_path = self.path / self.INDEX_NAME
+        if mode == 'w':
+            self.path.mkdir(parents=True, exist_ok=True)
+            for old in self.path.glob('segment-*.arrow'):
+                old.unlink()
+            self._segments = []
+            self._write_index()
+        elif index_path.exists():
+            self._segments = json.loads(index_path.read_text())['segments']
+        elif mode == 'r':
+            raise FileNotFoundError(f'no spectrogram in {str(self.path)!r}')
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return sum(seg['rows'] for seg in self._segments) + self._pending_rows
+
+    def __repr__(self):
+        return f'{type(self).__name__}({str(self.path)!r}, mode={self.mode!r})'
+
+    @property
+    def segments(self) -> 'pd.DataFrame':
+        """a table of the segments, with the number of rows, time span, and instrument state of each"""
+        rows = []
+        for seg in self._segments:
+            times = [b['time'] for b in seg['batches'] if b['time'] is not None]
+            rows.append(
+                dict(
+                    seg['state'],
+                    file=seg['file'],
+                    rows=seg['rows'],
+                    start=times[0][0] if times else None,
+                    stop=times[-1][1] if times else None,
+                )
+            )
+        df = pd.DataFrame(rows)
+        df.index.name = 'Segment'
+        return df
+
+    def new_segment(self, state: Union[dict, None] = None):
+        """Start a new segment with the next append.
+
+        Arguments:
+            state: JSON-serializable instrument state that applies to the new segment
+        """
+        self._check_writable()
+        self._finish_segment()
+        self._state = dict(state or {})
+
+    def append(
+        self,
+        data: 'np.ndarray',
+        frequency: Union['np.ndarray', None] = None,
+        timestamps: Union['np.ndarray', None] = None,
+    ):
+        """append rows of spectrogram data, or a single trace.
+
+        Arguments:
+            data: 2-D array of spectrogram rows in chronological order, or a 1-D trace
+            frequency: the frequency axis of the columns of `data`, or None if not known
+            timestamps: the timestamp of each row of `data`, or None
+        """
+        self._check_writable()
+
+        data = np.asarray(data)
+        if data.ndim == 1:
+            data = data[np.newaxis]
+        elif data.ndim != 2:
+            raise ValueError(f'expected spectrogram or trace data, but got shape {data.shape}')
+
+        if timestamps is not None:
+            timestamps = np.atleast_1d(np.asarray(timestamps))
+            if timestamps.size != data.shape[0]:
+                raise ValueError('the number of timestamps must match the number of rows')
+
+        if self._writer is not None and not self._matches_segment(
+            data, frequency, timestamps
+        ):
+            self._finish_segment()
+        if self._writer is None:
+            self._start_segment(data, frequency, timestamps)
+
+        # copy, since `data` may be a view of a buffer that is reused for the next transfer
+        self._pending.append((np.array(data, dtype=np.float32), timestamps))
+        self._pending_rows += data.shape[0]
+
+        if self._pending_rows >= self.batch_rows:
+            self._write_pending()
+
+    def flush(self):
+        """write buffered rows as a record batch, and update the index"""
+        if self._writer is not None:
+            self._write_pending()
+            self._write_index()
+
+    def close(self):
+        if self.mode != 'r':
+            self._finish_segment()
+
+    def read(
+        self,
+        start=None,
+        stop=None,
+        fmin: Union[float, None] = None,
+        fmax: Union[float, None] = None,
+        segment: Union[int, None] = None,
+    ) -> 'pd.DataFrame':
+        """Load a time and frequency range into a DataFrame indexed on timestamp and labeled by frequency.
+
+        Only the record batches that overlap the time range are decompressed.
+
+        Arguments:
+            start: the earliest timestamp to include, or None to start from the first row
+            stop: the latest timestamp to include, or None to end with the last row
+            fmin: the lowest frequency to include, or None for no lower limit
+            fmax: the highest frequency to include, or None for no upper limit
+            segment: the segment number to read, or None to read all segments (which must share a frequency axis)
+        """
+        if segment is None:
+            segments = self._segments
+        else:
+            segments = [self._segments[segment]]
+
+        frames = []
+        for seg in segments:
+            frames.append(self._read_segment(seg, start, stop, fmin, fmax))
+
+        if len(frames) == 0:
+            return pd.DataFrame()
+
+        columns = frames[0].columns
+        if any(len(df.columns) != len(columns) or (df.columns != columns).any() for df in frames):
+            raise ValueError('segments have different frequency axes; select one with `segment`')
+        return pd.concat(frames, axis=0)
+
+    def _read_segment(self, seg, start, stop, fmin, fmax) -> 'pd.DataFrame':
+        pa = self._pa
+
+        with pa.memory_map(str(self.path / seg['file'])) as source:
+            reader = pa.ipc.open_file(source)
+            meta = reader.schema.metadata or {}
+            if b'frequency' in meta:
+                frequency = np.frombuffer(meta[b'frequency'], dtype=np.float64)
+            else:
+                frequency = None
+
+            columns = seg['columns']
+            if frequency is None:
+                col_mask = slice(None)
+            else:
+                col_mask = np.ones(columns, dtype=bool)
+                if fmin is not None:
+                    col_mask &= frequency >= fmin
+                if fmax is not None:
+                    col_mask &= frequency <= fmax
+                frequency = frequency[col_mask]
+
+            values = []
+            times = []
+            for i, info in enumerate(seg['batches']):
+                span = info['time']
+                if span is not None:
+                    if start is not None and span[1] < start:
+                        continue
+                    if stop is not None and span[0] > stop:
+                        continue
+
+                batch = reader.get_batch(i)
+                power = batch.column('power').values.to_numpy().reshape(-1, columns)
+
+                if 'time' in batch.schema.names:
+                    t = batch.column('time').to_numpy()
+                    row_mask = np.ones(t.size, dtype=bool)
+                    if start is not None:
+                        row_mask &= t >= start
+                    if stop is not None:
+                        row_mask &= t <= stop
+                    times.append(t[row_mask])
+                    values.append(power[row_mask][:, col_mask])
+                else:
+                    values.append(power[:, col_mask])
+
+        if len(values) == 0:
+            return pd.DataFrame(columns=frequency)
+
+        data = np.concatenate(values, axis=0)
+        index = np.concatenate(times) if len(times) > 0 else None
+        return pd.DataFrame(data, index=index, columns=frequency)
+
+    def _check_writable(self):
+        if self.mode == 'r':
+            raise IOError(f'{self!r} is read-only')
+
+    def _matches_segment(self, data, frequency, timestamps) -> bool:
+        seg = self._segments[-1]
+        if data.shape[1] != seg['columns']:
+            return False
+        if (timestamps is None) != (seg['time_dtype'] is None):
+            return False
+        if frequency is not None and (
+            self._frequency is None
+            or not np.array_equal(np.asarray(frequency, dtype=np.float64), self._frequency)
+        ):
+            return False
+        return True
+
+    def _start_segment(self, data, frequency, timestamps):
+        pa = self._pa
+
+        fields = []
+        if timestamps is not None:
+            fields.append(pa.field('time', pa.from_numpy_dtype(timestamps.dtype)))
+        fields.append(pa.field('power', pa.list_(pa.float32(), data.shape[1])))
+
+        metadata = {'state': json.dumps(self._state)}
+        if frequency is None:
+            self._frequency = None
+        else:
+            self._frequency = np.asarray(frequency, dtype=np.float64)
+            metadata['frequency'] = self._frequency.tobytes()
+
+        name = f'segment-{len(self._segments):05d}.arrow'
+        schema = pa.schema(fields, metadata=metadata)
+        options = pa.ipc.IpcWriteOptions(compression=self.compression)
+        self._sink = pa.OSFile(str(self.path / name), 'wb')
+        self._writer = pa.ipc.new_file(self._sink, schema, options=options)
+
+        self._segments.append(
+            {
+                'file': name,
+                'state': self._state,
+                'columns': data.shape[1],
+                'time_dtype': None if timestamps is None else timestamps.dtype.str,
+                'rows': 0,
+                'batches': [],
+            }
+        )
+
+    def _write_pending(self):
+        if self._pending_rows == 0:
+            return
+
+        pa = self._pa
+        seg = self._segments[-1]
+
+        data = np.concatenate([d for d, _ in self._pending], axis=0)
+        arrays = []
+        names = []
+        span = None
+        if seg['time_dtype'] is not None:
+            t = np.concatenate([t for _, t in self._pending])
+            arrays.append(pa.array(t))
+            names.append('time')
+            span = [t.min().item(), t.max().item()]
+        arrays.append(pa.FixedSizeListArray.from_arrays(pa.array(data.ravel()), data.shape[1]))
+        names.append('power')
+
+        self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, names=names))
+        seg['batches'].append({'rows': data.shape[0], 'time': span})
+        seg['rows'] += data.shape[0]
+
+        self._pending = []
+        self._pending_rows = 0
+
+    def _finish_segment(self):
+        if self._writer is None:
+            return
+        self._write_pending()
+        self._writer.close()
+        self._sink.close()
+        self._writer = None
+        self._write_index()
+
+    def _write_index(self):
+        index_path = self.path / self.INDEX_NAME
+        tmp = index_path.with_suffix('.tmp')
+        tmp.write_text(json.dumps({'segments': self._segments}))
+        tmp.replace(index_path)
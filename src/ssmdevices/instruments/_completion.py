@@ -0,0 +1,221 @@
+"""Waiting for operation complete on SCPI instruments, shared by overlap_and_block implementations"""
+
+import time
+import labbench as lb
+import typing
+from typing import Callable, Union
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+    import numpy as np
+else:
+    # delayed import for speed
+    pd = lb.util.lazy_import('pandas')
+    np = lb.util.lazy_import('numpy')
+
+__all__ = ['CompletionWaiter']
+
+
+class CompletionWaiter:
+    """Wait for the operation complete event of an instrument after overlapped commands.
+
+    The wait is implemented by the first available of these methods:
+
+    * 'srq': the operation complete bit in the event status register raises a
+      service request, which is awaited as a VISA event (where the VISA library and
+      transport support it, such as USBTMC, GPIB, VXI-11, and HiSLIP)
+    * the `fallback` method, which is one of:
+
+      * 'opc': a blocking `*OPC?` query
+      * 'poll': polling `*ESR?`, with an interval that starts at `min_interval` and
+        grows by `growth` per poll up to `max_interval`
+
+    For the 'srq' and 'poll' methods, `arm` clears the event status register and
+    `wait` sends a single '*OPC' before waiting, so that the operation complete bit
+    is set only after every command sent in between has finished. The commands
+    in between should therefore not carry their own '*OPC'.
+
+    The latency of each wait is recorded in a histogram.
+
+    Arguments:
+        device: the instrument
+        fallback: 'opc' or 'poll', used if service requests are not available
+        timeout_error: callable that returns the exception to raise on timeout
+        use_srq: if False, always use the fallback method
+        min_interval: the first polling interval (in s)
+        max_interval: the longest polling interval (in s)
+        growth: the factor by which the polling interval grows after each poll
+    """
+
+    def __init__(
+        self,
+        device: lb.VISADevice,
+        fallback: str = 'poll',
+        timeout_error: Callable[[], BaseException] = lambda: TimeoutError('command failed'),
+        use_srq: bool = True,
+        min_interval: float = 200e-6,
+        max_interval: float = 20e-3,
+        growth: float = 1.5,
+    ):
+        if fallback not in ('opc', 'poll'):
+            raise ValueError(f"fallback must be 'opc' or 'poll', not {fallback!r}")
+
+        self.device = device
+        self.fallback = fallback
+        self.timeout_error = timeout_error
+        self.use_srq = use_srq
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.growth = growth
+
+        self.method = None
+
+        # histogram bin edges (in s): 5 per decade from 10 us to 1000 s
+        self.edges = 10.0 ** (np.arange(-25, 16) / 5)
+        self.counts = np.zeros(self.edges.size + 1, dtype=np.int64)
+        self._total = 0.0
+        self._max = 0.0
+
+    def arm(self):
+        """Prepare to wait, before sending the overlapped commands."""
+        if self.method is None:
+            self.method = self._negotiate()
+
+        if self.method == 'opc':
+            return
+
+        # clear an operation complete bit left over from earlier operations
+        self.device.backend.query('*ESR?')
+
+        if self.method == 'srq':
+            from pyvisa.constants import EventMechanism, EventType
+
+            # discard service requests that were left over from earlier operations
+            self.device.backend.discard_events(
+                EventType.service_request, EventMechanism.queue
+            )
+
+    def wait(self, timeout: Union[float, None] = None) -> float:
+        """Block until the instrument reports operation complete.
+
+        Arguments:
+            timeout: the maximum time to wait (in s, for every method), or None to use the VISA timeout
+
+        Returns:
+            the time spent waiting (in s)
+        """
+        if self.method is None:
+            self.method = self._negotiate()
+
+        if timeout is None and self.method != 'opc':
+            # VISA timeouts are in ms
+            timeout = self.device.backend.timeout / 1000
+
+        t0 = time.perf_counter()
+
+        if self.method != 'opc':
+            # sets the operation complete bit after all earlier commands are done
+            self.device.backend.write('*OPC')
+
+        if self.method == 'srq':
+            self._wait_srq(timeout)
+        elif self.method == 'opc':
+            self._wait_opc(timeout)
+        else:
+            self._wait_poll(timeout, t0)
+
+        latency = time.perf_counter() - t0
+        self._record(latency)
+        return latency
+
+    def reset(self):
+        """Negotiate the method again on the next wait (for example, after an instrument preset)."""
+        self.method = None
+
+    def histogram(self) -> 'pd.Series':
+        """Return the counts of completion latencies, indexed by the upper edge of each bin (in s)."""
+        index = pd.Index(np.append(self.edges, np.inf), name='Latency (s)')
+        return pd.Series(self.counts, index=index, name='Count')
+
+    def stats(self) -> dict:
+        count = int(self.counts.sum())
+        return {
+            'method': self.method,
+            'count': count,
+            'mean': self._total / count if count > 0 else float('nan'),
+            'max': self._max,
+        }
+
+    def _negotiate(self) -> str:
+        if not self.use_srq:
+            return self.fallback
+
+        from pyvisa.constants import EventMechanism, EventType
+        from pyvisa.errors import VisaIOError
+
+        backend = self.device.backend
+        try:
+            backend.enable_event(EventType.service_request, EventMechanism.queue)
+        except (NotImplementedError, VisaIOError, AttributeError):
+            # unsupported by the VISA library or the transport (e.g., raw sockets)
+            return self.fallback
+
+        # operation complete -> event status bit in the status byte -> service request
+        self.device.write('*ESE 1;*SRE 32')
+        return 'srq'
+
+    @staticmethod
+    def _visa_timeout_ms(timeout: Union[float, None]) -> Union[int, None]:
+        """convert a wait timeout in s to the VISA timeout in ms"""
+        if timeout is None:
+            return None
+        if timeout < 0:
+            raise ValueError(f'timeout must be non-negative, not {timeout!r}')
+        return max(int(round(1000 * timeout)), 1)
+
+    def _wait_opc(self, timeout):
+        # the VISA timeout is set directly, since the unit of labbench query
+        # timeouts differs between labbench releases
+        backend = self.device.backend
+        prev_timeout = backend.timeout
+        if timeout is not None:
+            backend.timeout = self._visa_timeout_ms(timeout)
+        try:
+            backend.query('*OPC?')
+        finally:
+            backend.timeout = prev_timeout
+
+    def _wait_srq(self, timeout):
+        from pyvisa.constants import EventType
+
+        backend = self.device.backend
+        timeout_ms = None if timeout == float('inf') else self._visa_timeout_ms(timeout)
+
+        response = backend.wait_on_event(
+            EventType.service_request, timeout_ms, capture_timeout=True
+        )
+        if response.timed_out:
+            raise self.timeout_error()
+
+        # clear the request and the event status register
+        backend.read_stb()
+        backend.query('*ESR?')
+
+    def _wait_poll(self, timeout, t0):
+        backend = self.device.backend
+        interval = self.min_interval
+
+        while True:
+            if int(backend.query('*ESR?')) & 1:
+                # first bit == operation complete
+                return
+            if timeout is not None and time.perf_counter() - t0 >= timeout:
+                raise self.timeout_error()
+
+            time.sleep(interval)
+            interval = min(interval * self.growth, self.max_interval)
+
+    def _record(self, latency: float):
+        self.counts[np.searchsorted(self.edges, latency)] += 1
+        self._total += latency
+        self._max = max(self._max, latency)
@@ -0,0 +1,197 @@
+"""Host-side bookkeeping for long-running mask trigger event captures"""
+
+import collections
+import time
+from pathlib import Path
+import labbench as lb
+import typing
+from typing import Callable, Union
+from ._spectrogram import DiskSpectrogram
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+    import numpy as np
+else:
+    # delayed import for speed
+    pd = lb.util.lazy_import('pandas')
+    np = lb.util.lazy_import('numpy')
+
+__all__ = ['MaskEventRecorder']
+
+
+class MaskEventRecorder:
+    """Keep a bounded record of spectrogram events acquired on mask triggers.
+
+    Each event is summarized in a compact index, and the spectrogram of only the most
+    recent `capacity` events is kept in memory. When `criteria` is given, the
+    spectrograms of matching events are also written to disk as a
+    :class:`DiskSpectrogram` in a numbered subdirectory of `spill_dir`.
+
+    The index columns are:
+
+    * `trigger_time`: the first timestamp of the event spectrogram (in s)
+    * `peak_power`: the maximum power in the event
+    * `peak_frequency`: the frequency of `peak_power`
+    * `band_low` and `band_high`: the lowest and highest frequency at which the peak-hold spectrum is within `band_threshold` dB of `peak_power`
+    * `rows`: the number of spectrogram rows in the event
+    * `spilled`: whether the event was written to disk
+
+    Example::
+
+        recorder = MaskEventRecorder(
+            capacity=16,
+            spill_dir='events',
+            criteria=lambda event, data, frequency: event['peak_power'] > -40,
+        )
+        rtsa.record_mask_events(recorder, duration=3600)
+        recorder.events().query('band_high - band_low > 1e6')
+
+    Arguments:
+        capacity: the number of the most recent event spectrograms to keep in memory
+        spill_dir: directory that will contain event spectrograms that match `criteria`
+        criteria: callable `criteria(event: dict, data: np.ndarray, frequency: np.ndarray) -> bool`, or None to keep nothing on disk
+        band_threshold: the level below `peak_power` (in dB) that defines the occupied band
+    """
+
+    _INDEX_DTYPE = [
+        ('trigger_time', 'float64'),
+        ('peak_power', 'float32'),
+        ('peak_frequency', 'float64'),
+        ('band_low', 'float64'),
+        ('band_high', 'float64'),
+        ('rows', 'int32'),
+        ('spilled', 'bool'),
+    ]
+
+    def __init__(
+        self,
+        capacity: int = 16,
+        spill_dir: Union[str, Path, None] = None,
+        criteria: Union[Callable, None] = None,
+        band_threshold: float = 20.0,
+    ):
+        if criteria is not None and spill_dir is None:
+            raise ValueError('spill_dir must be set to spill events that match criteria')
+
+        self.capacity = capacity
+        self.spill_dir = None if spill_dir is None else Path(spill_dir)
+        self.criteria = criteria
+        self.band_threshold = band_threshold
+
+        self.recent = collections.deque(maxlen=capacity)
+
+        self._index = None
+        self._count = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.armed_time = 0.0
+        self._t0 = None
+
+    def __len__(self):
+        return self._count
+
+    def start(self):
+        """Mark the start of the recording, for rate and dead time statistics."""
+        if self._t0 is None:
+            self._t0 = time.perf_counter()
+
+    def add_armed_time(self, seconds: float):
+        """Accumulate time during which the trigger was armed."""
+        self.armed_time += seconds
+
+    def drop(self):
+        """Count an event that was triggered, but could not be recorded."""
+        self.dropped += 1
+
+    def add(
+        self,
+        data: 'np.ndarray',
+        frequency: 'np.ndarray',
+        timestamps: Union['np.ndarray', None] = None,
+    ) -> dict:
+        """Summarize an event spectrogram, and keep or spill it as configured.
+
+        Arguments:
+            data: 2-D spectrogram of the event in chronological order
+            frequency: the frequency axis of the columns of `data`
+            timestamps: the timestamp of each row of `data`, or None
+
+        Returns:
+            the index entry of the event
+        """
+        self.start()
+
+        data = np.asarray(data)
+        frequency = np.asarray(frequency)
+
+        # peak hold over time, then the bins within band_threshold of the peak
+        spectrum = data.max(axis=0)
+        ipeak = int(spectrum.argmax())
+        peak = float(spectrum[ipeak])
+        occupied = np.flatnonzero(spectrum >= peak - self.band_threshold)
+
+        if timestamps is None:
+            trigger_time = np.nan
+        elif np.issubdtype(np.asarray(timestamps).dtype, np.integer):
+            # nanoseconds
+            trigger_time = int(timestamps[0]) / 1e9
+        else:
+            trigger_time = float(timestamps[0])
+
+        event = {
+            'trigger_time': trigger_time,
+            'peak_power': peak,
+            'peak_frequency': float(frequency[ipeak]),
+            'band_low': float(frequency[occupied[0]]),
+            'band_high': float(frequency[occupied[-1]]),
+            'rows': data.shape[0],
+            'spilled': False,
+        }
+
+        # `data` may be a view of a buffer that is reused for the next transfer
+        self.recent.append((self._count, np.array(data), timestamps))
+
+        if self.criteria is not None and self.criteria(event, data, frequency):
+            path = self.spill_dir / f'event-{self._count:08d}'
+            with DiskSpectrogram(path, mode='w') as spg:
+                spg.append(data, frequency, timestamps)
+            event['spilled'] = True
+            self.spilled += 1
+
+        self._append_index(event)
+        return event
+
+    def events(self) -> 'pd.DataFrame':
+        """Return the index of all recorded events as a DataFrame indexed by event number."""
+        if self._index is None:
+            index = np.empty(0, dtype=self._INDEX_DTYPE)
+        else:
+            index = self._index[: self._count]
+        df = pd.DataFrame(index)
+        df.index.name = 'Event'
+        return df
+
+    def stats(self) -> dict[str, float]:
+        """Return counters of events and of the time spent away from the trigger."""
+        elapsed = 0.0 if self._t0 is None else time.perf_counter() - self._t0
+        dead_time = max(elapsed - self.armed_time, 0.0)
+        return {
+            'events': self._count,
+            'dropped': self.dropped,
+            'spilled': self.spilled,
+            'elapsed': elapsed,
+            'armed_time': self.armed_time,
+            'dead_time': dead_time,
+            'event_rate': self._count / elapsed if elapsed > 0 else 0.0,
+            'dead_time_fraction': dead_time / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def _append_index(self, event: dict):
+        if self._index is None:
+            self._index = np.empty(1024, dtype=self._INDEX_DTYPE)
+        elif self._count == self._index.size:
+            # amortized growth; each entry takes about 50 bytes
+            self._index = np.resize(self._index, 2 * self._index.size)
+
+        self._index[self._count] = tuple(event[name] for name, _ in self._INDEX_DTYPE)
+        self._count += 1
@@ -0,0 +1,147 @@
+"""Running statistics of power sensor readings that are updated one buffer at a time"""
+
+import time
+import labbench as lb
+import typing
+from typing import Union
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+    import numpy as np
+else:
+    # delayed import for speed
+    pd = lb.util.lazy_import('pandas')
+    np = lb.util.lazy_import('numpy')
+
+__all__ = ['PowerStatistics']
+
+
+class PowerStatistics:
+    """Fold buffers of power readings into statistics that take constant memory.
+
+    The mean is taken in linear power units, and reported in dBm. The peak is the
+    largest of the readings (or of separate peak readings, for sensors that measure
+    them on a second measurement channel). When `edges` is given, readings are also
+    counted into a histogram in dBm, with underflow and overflow bins.
+
+    Arguments:
+        edges: monotonically increasing histogram bin edges (in dBm), or None to skip the histogram
+    """
+
+    def __init__(self, edges: Union['np.ndarray', None] = None):
+        self.edges = None if edges is None else np.asarray(edges, dtype=np.float64)
+        self.reset()
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return f'{type(self).__name__}(count={self.count})'
+
+    def reset(self):
+        """Clear the statistics."""
+        self.count = 0
+        self.buffers = 0
+        self._sum = 0.0
+        self._peak = -np.inf
+        self._min = np.inf
+        self._t0 = None
+        self._t1 = None
+
+        if self.edges is None:
+            self.counts = None
+        else:
+            # underflow, each bin, overflow
+            self.counts = np.zeros(self.edges.size + 1, dtype=np.int64)
+
+    def start(self):
+        """Mark the start of acquisition, for the achieved sample rate."""
+        if self._t0 is None:
+            self._t0 = time.perf_counter()
+
+    def update(
+        self,
+        readings: 'np.ndarray',
+        peaks: Union['np.ndarray', None] = None,
+    ):
+        """Fold one buffer of readings into the statistics.
+
+        Arguments:
+            readings: power readings in linear units (mW)
+            peaks: peak power readings in linear units (mW) to track instead of `readings`, or None
+        """
+        readings = np.atleast_1d(readings)
+        if readings.size == 0:
+            return
+
+        self.start()
+        self._t1 = time.perf_counter()
+
+        self.count += readings.size
+        self.buffers += 1
+        self._sum += float(readings.sum(dtype=np.float64))
+        self._min = min(self._min, float(readings.min()))
+        if peaks is None:
+            self._peak = max(self._peak, float(readings.max()))
+        else:
+            self._peak = max(self._peak, float(np.max(peaks)))
+
+        if self.counts is not None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                dBm = 10 * np.log10(np.abs(readings))
+            self.counts += np.bincount(
+                np.searchsorted(self.edges, dBm, side='right'),
+                minlength=self.counts.size,
+            )
+
+    @property
+    def mean(self) -> float:
+        """the mean power (in dBm)"""
+        if self.count == 0:
+            return np.nan
+        return 10 * np.log10(np.abs(self._sum / self.count))
+
+    @property
+    def peak(self) -> float:
+        """the peak power (in dBm)"""
+        if self.count == 0:
+            return np.nan
+        return 10 * np.log10(np.abs(self._peak))
+
+    @property
+    def minimum(self) -> float:
+        """the smallest power reading (in dBm)"""
+        if self.count == 0:
+            return np.nan
+        return 10 * np.log10(np.abs(self._min))
+
+    @property
+    def elapsed(self) -> float:
+        """the time from the start of acquisition to the last update (in s)"""
+        if self._t0 is None or self._t1 is None:
+            return 0.0
+        return self._t1 - self._t0
+
+    @property
+    def sample_rate(self) -> float:
+        """the achieved rate of power readings (in readings/s)"""
+        elapsed = self.elapsed
+        return self.count / elapsed if elapsed > 0 else np.nan
+
+    def histogram(self) -> 'pd.Series':
+        """Return the reading counts, indexed by the upper edge of each bin (in dBm)."""
+        if self.counts is None:
+            raise ValueError('histogram edges were not set')
+        index = pd.Index(np.append(self.edges, np.inf), name='Power (dBm)')
+        return pd.Series(self.counts, index=index, name='Count')
+
+    def stats(self) -> dict[str, float]:
+        return {
+            'mean': self.mean,
+            'peak': self.peak,
+            'minimum': self.minimum,
+            'count': self.count,
+            'buffers': self.buffers,
+            'elapsed': self.elapsed,
+            'sample_rate': self.sample_rate,
+        }
@@ -0,0 +1,266 @@
+"""Online reductions of spectrogram data that are updated as blocks are acquired"""
+
+import labbench as lb
+import typing
+from typing import Union
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+    import numpy as np
+else:
+    # delayed import for speed
+    pd = lb.util.lazy_import('pandas')
+    np = lb.util.lazy_import('numpy')
+
+__all__ = [
+    'SpectrogramReducer',
+    'HoldReducer',
+    'MeanReducer',
+    'HistogramReducer',
+    'OccupancyReducer',
+]
+
+
+class SpectrogramReducer:
+    """Base class for per-frequency statistics that are updated one spectrogram block
+    at a time, without keeping the spectrogram rows.
+
+    Reducers implement the same `append(data, frequency, timestamps)` interface as
+    :class:`DiskSpectrogram`, so they can be passed as the `sink` of
+    `fetch_spectrogram` or `acquire_spectrogram_sequence` (alone, or several in a list).
+
+    Subclasses implement `_init_state(columns)`, `_update(data)`, and `result()`.
+    """
+
+    def __init__(self):
+        self.frequency = None
+        self.count = 0
+        self.first_time = None
+        self.last_time = None
+
+        # empty statistics until the first block sets the number of columns
+        self._init_state(0)
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return f'{type(self).__name__}(count={self.count})'
+
+    def append(
+        self,
+        data: 'np.ndarray',
+        frequency: Union['np.ndarray', None] = None,
+        timestamps: Union['np.ndarray', None] = None,
+    ):
+        """update the statistics with rows of spectrogram data.
+
+        Arguments:
+            data: 2-D array of spectrogram rows (strided views are accepted)
+            frequency: the frequency axis of the columns of `data`, or None if not known
+            timestamps: the timestamp of each row of `data`, or None
+        """
+        data = np.asarray(data)
+        if data.ndim != 2:
+            raise ValueError(f'expected 2-D spectrogram data, but got shape {data.shape}')
+        if data.shape[0] == 0:
+            return
+
+        if self.count == 0:
+            self._init_state(data.shape[1])
+            if frequency is not None:
+                self.frequency = np.array(frequency)
+        elif data.shape[1] != self._columns:
+            raise ValueError(
+                f'cannot reduce {data.shape[1]} columns into statistics of {self._columns}'
+            )
+
+        self._update(data)
+        self.count += data.shape[0]
+
+        if timestamps is not None and len(timestamps) > 0:
+            if self.first_time is None:
+                self.first_time = timestamps[0]
+            self.last_time = timestamps[-1]
+
+    def result(self) -> Union['pd.Series', 'pd.DataFrame']:
+        raise NotImplementedError
+
+    def _init_state(self, columns: int):
+        self._columns = columns
+
+    def _update(self, data: 'np.ndarray'):
+        raise NotImplementedError
+
+    def _wrap(self, columns: dict) -> 'pd.DataFrame':
+        df = pd.DataFrame(columns, index=self.frequency)
+        df.index.name = 'Frequency'
+        return df
+
+
+class HoldReducer(SpectrogramReducer):
+    """Track the maximum and minimum value in each frequency bin (max-hold and min-hold)."""
+
+    def _init_state(self, columns):
+        super()._init_state(columns)
+        self.max = np.full(columns, -np.inf, dtype=np.float32)
+        self.min = np.full(columns, np.inf, dtype=np.float32)
+
+    def _update(self, data):
+        np.maximum(self.max, data.max(axis=0), out=self.max)
+        np.minimum(self.min, data.min(axis=0), out=self.min)
+
+    def result(self) -> 'pd.DataFrame':
+        return self._wrap({'max': self.max, 'min': self.min})
+
+
+class MeanReducer(SpectrogramReducer):
+    """Track the mean and variance in each frequency bin.
+
+    Each block is combined with the running statistics with the parallel form of
+    Welford's algorithm, in double precision. The statistics are of the values as
+    they are acquired (typically dB units).
+    """
+
+    def _init_state(self, columns):
+        super()._init_state(columns)
+        self.mean = np.zeros(columns, dtype=np.float64)
+        self._m2 = np.zeros(columns, dtype=np.float64)
+
+    def _update(self, data):
+        n_a = self.count
+        n_b = data.shape[0]
+        n = n_a + n_b
+
+        mean_b = data.mean(axis=0, dtype=np.float64)
+        m2_b = data.var(axis=0, dtype=np.float64) * n_b
+
+        delta = mean_b - self.mean
+        self.mean += delta * (n_b / n)
+        self._m2 += m2_b + delta**2 * (n_a * n_b / n)
+
+    @property
+    def variance(self) -> 'np.ndarray':
+        """the sample variance in each bin (NaN until there are 2 rows)"""
+        if self.count < 2:
+            return np.full_like(self.mean, np.nan)
+        return self._m2 / (self.count - 1)
+
+    def result(self) -> 'pd.DataFrame':
+        var = self.variance
+        return self._wrap({'mean': self.mean, 'variance': var, 'std': np.sqrt(var)})
+
+
+class HistogramReducer(SpectrogramReducer):
+    """Count values in each frequency bin into fixed bins, to estimate percentiles.
+
+    Values outside of `edges` are counted in underflow and overflow bins, which
+    percentile estimates clip to the first and last edge. Blocks are binned a few
+    rows at a time, so that the temporary bin indices stay small.
+
+    Arguments:
+        edges: monotonically increasing bin edges, shared by all frequency bins (default: -200 to 50 in 0.5 dB steps)
+    """
+
+    # the number of values to bin at a time
+    _CHUNK_ELEMENTS = 1 << 18
+
+    def __init__(self, edges: Union['np.ndarray', None] = None):
+        if edges is None:
+            edges = np.arange(-200, 50.5, 0.5)
+        self.edges = np.asarray(edges, dtype=np.float64)
+        super().__init__()
+
+    def _init_state(self, columns):
+        super()._init_state(columns)
+        # rows are: underflow, each bin, overflow
+        self.counts = np.zeros((self.edges.size + 1, columns), dtype=np.int64)
+
+    def _update(self, data):
+        columns = data.shape[1]
+        chunk_rows = max(self._CHUNK_ELEMENTS // columns, 1)
+        offsets = np.arange(columns)
+        counts = self.counts.reshape(-1)
+
+        for start in range(0, data.shape[0], chunk_rows):
+            # index into the flattened (bin, column) counts, computed in place
+            flat = np.searchsorted(self.edges, data[start : start + chunk_rows], side='right')
+            flat *= columns
+            flat += offsets
+            counts += np.bincount(flat.ravel(), minlength=counts.size)
+
+    def percentile(self, q: Union[float, list[float]]) -> 'pd.DataFrame':
+        """Estimate percentiles in each frequency bin by linear interpolation within histogram bins.
+
+        Arguments:
+            q: percentile or sequence of percentiles, in the range 0 to 100
+        """
+        qs = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        cdf = np.cumsum(self.counts, axis=0)
+        total = cdf[-1]
+        columns = np.arange(self._columns)
+
+        result = {}
+        for q_ in qs:
+            target = q_ / 100 * total
+            # the first histogram row at which the count reaches the target
+            row = np.minimum((cdf < target[np.newaxis]).sum(axis=0), cdf.shape[0] - 1)
+            below = np.where(row > 0, cdf[row - 1, columns], 0)
+            in_bin = self.counts[row, columns]
+            frac = np.divide(
+                target - below, in_bin, out=np.zeros(self._columns), where=in_bin > 0
+            )
+
+            lo = self.edges[np.clip(row - 1, 0, self.edges.size - 1)]
+            hi = self.edges[np.clip(row, 0, self.edges.size - 1)]
+            value = lo + frac * (hi - lo)
+            result[q_] = np.where(total > 0, value, np.nan)
+
+        return self._wrap(result)
+
+    def result(self) -> 'pd.DataFrame':
+        return self.percentile([5, 50, 95])
+
+
+class OccupancyReducer(SpectrogramReducer):
+    """Track the fraction of rows in each frequency bin that exceed a threshold.
+
+    Arguments:
+        threshold: the threshold level (in the units of the data), as a scalar or one value per frequency bin
+    """
+
+    def __init__(self, threshold: Union[float, 'np.ndarray']):
+        super().__init__()
+        self.threshold = threshold
+
+    def _init_state(self, columns):
+        super()._init_state(columns)
+        self.exceeded = np.zeros(columns, dtype=np.int64)
+
+    def _update(self, data):
+        self.exceeded += (data > self.threshold).sum(axis=0)
+
+    @property
+    def occupancy(self) -> 'np.ndarray':
+        if self.count == 0:
+            return np.full(self.exceeded.shape, np.nan)
+        return self.exceeded / self.count
+
+    def result(self) -> 'pd.DataFrame':
+        return self._wrap({'occupancy': self.occupancy})
+
+
+class _SinkGroup:
+    """pass each spectrogram block to several sinks"""
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def append(self, data, frequency=None, timestamps=None):
+        for sink in self.sinks:
+            sink.append(data, frequency, timestamps)
+
+    def flush(self):
+        for sink in self.sinks:
+            if hasattr(sink, 'flush'):
+                sink.flush()
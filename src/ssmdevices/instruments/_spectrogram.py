@@ -0,0 +1,205 @@
+"""Host-side containers for spectrogram data acquired by signal analyzers"""
+
+import json
+from pathlib import Path
+import labbench as lb
+import typing
+from typing import Union
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+    import numpy as np
+else:
+    # delayed import for speed
+    pd = lb.util.lazy_import('pandas')
+    np = lb.util.lazy_import('numpy')
+
+__all__ = ['DiskSpectrogram']
+
+
+class DiskSpectrogram:
+    """An append-only spectrogram stored in a directory on disk.
+
+    Rows are appended in chronological order as they are acquired, so that the memory
+    needed for a long acquisition does not grow with its duration. Reads are lazy:
+    `data` is a read-only memory map, and `to_dataframe` loads only the requested rows.
+
+    The directory contains:
+
+    * `power.bin`: spectrogram rows, in row-major order without a header
+    * `time.bin`: the timestamp of each row (if timestamps are appended)
+    * `frequency.npy`: the frequency axis (if one is appended)
+    * `meta.json`: the data types and the number of frequency bins
+
+    Example::
+
+        with DiskSpectrogram('capture', mode='w') as spg:
+            spg.append(data, frequency, timestamps)
+
+        spg = DiskSpectrogram('capture')
+        last_hour = spg.to_dataframe(start=-3600 * 10)
+
+    Arguments:
+        path: directory that contains the spectrogram files
+        mode: 'r' to read, 'w' to create (clearing existing data), or 'a' to append to existing data
+    """
+
+    # number of rows to copy into a contiguous buffer per write
+    WRITE_ROWS = 1024
+
+    def __init__(self, path: Union[str, Path], mode: str = 'r'):
+        if mode not in ('r', 'w', 'a'):
+            raise ValueError(f"mode must be 'r', 'w', or 'a', not {mode!r}")
+
+        self.path = Path(path)
+        self.mode = mode
+        self._meta = None
+        self._files = {}
+
+        if mode == 'w':
+            self.path.mkdir(parents=True, exist_ok=True)
+            for name in ('power.bin', 'time.bin', 'frequency.npy', 'meta.json'):
+                (self.path / name).unlink(missing_ok=True)
+        elif (self.path / 'meta.json').exists():
+            self._meta = json.loads((self.path / 'meta.json').read_text())
+        elif mode == 'r':
+            raise FileNotFoundError(f'no spectrogram in {str(self.path)!r}')
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        if self._meta is None:
+            return 0
+        self.flush()
+        row_bytes = self._meta['columns'] * np.dtype(self._meta['dtype']).itemsize
+        return (self.path / 'power.bin').stat().st_size // row_bytes
+
+    def __repr__(self):
+        return f'{type(self).__name__}({str(self.path)!r}, mode={self.mode!r})'
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        if self._meta is None:
+            return (0, 0)
+        return (len(self), self._meta['columns'])
+
+    def append(
+        self,
+        data: 'np.ndarray',
+        frequency: Union['np.ndarray', None] = None,
+        timestamps: Union['np.ndarray', None] = None,
+    ):
+        """append rows of spectrogram data.
+
+        Arguments:
+            data: 2-D array of spectrogram rows in chronological order (strided views are accepted)
+            frequency: the frequency axis of the columns of `data`, or None if not known
+            timestamps: the timestamp of each row of `data`, or None
+        """
+        if self.mode == 'r':
+            raise IOError(f'{self!r} is read-only')
+
+        data = np.asarray(data)
+        if data.ndim != 2:
+            raise ValueError(f'expected 2-D spectrogram data, but got shape {data.shape}')
+
+        if self._meta is None:
+            self._init_meta(data, frequency, timestamps)
+        elif data.shape[1] != self._meta['columns']:
+            raise ValueError(
+                f'cannot append {data.shape[1]} columns to a spectrogram of {self._meta["columns"]}'
+            )
+
+        if (timestamps is None) != (self._meta['time_dtype'] is None):
+            raise ValueError('timestamps must be appended with every block, or never')
+
+        self._write('power.bin', data.astype(self._meta['dtype'], copy=False))
+        if timestamps is not None:
+            self._write('time.bin', np.asarray(timestamps, self._meta['time_dtype']))
+
+    def flush(self):
+        for fd in self._files.values():
+            fd.flush()
+
+    def close(self):
+        for fd in self._files.values():
+            fd.close()
+        self._files = {}
+
+    @property
+    def frequency(self) -> Union['np.ndarray', None]:
+        path = self.path / 'frequency.npy'
+        if path.exists():
+            return np.load(path)
+        else:
+            return None
+
+    @property
+    def data(self) -> 'np.ndarray':
+        """a read-only memory map of the spectrogram rows"""
+        rows, columns = self.shape
+        if rows == 0:
+            return np.empty((0, columns), dtype=self._meta_dtype('dtype'))
+        return np.memmap(
+            self.path / 'power.bin',
+            dtype=self._meta['dtype'],
+            mode='r',
+            shape=(rows, columns),
+        )
+
+    @property
+    def timestamps(self) -> Union['np.ndarray', None]:
+        """a read-only memory map of the row timestamps, or None if there are none"""
+        if self._meta is None or self._meta['time_dtype'] is None:
+            return None
+        rows = len(self)
+        if rows == 0:
+            return np.empty(0, dtype=self._meta['time_dtype'])
+        return np.memmap(
+            self.path / 'time.bin', dtype=self._meta['time_dtype'], mode='r', shape=rows
+        )
+
+    def to_dataframe(
+        self, start: Union[int, None] = None, stop: Union[int, None] = None
+    ) -> 'pd.DataFrame':
+        """load a range of rows into a DataFrame indexed on timestamp and labeled by frequency.
+
+        Arguments:
+            start: first row index (python slice semantics)
+            stop: stop row index (python slice semantics)
+        """
+        rows = slice(start, stop)
+        index = self.timestamps
+        if index is not None:
+            index = np.array(index[rows])
+        return pd.DataFrame(np.array(self.data[rows]), index=index, columns=self.frequency)
+
+    def _meta_dtype(self, key):
+        if self._meta is None:
+            return 'float32'
+        return self._meta[key]
+
+    def _init_meta(self, data, frequency, timestamps):
+        self._meta = {
+            'dtype': data.dtype.str,
+            'columns': data.shape[1],
+            'time_dtype': None if timestamps is None else np.asarray(timestamps).dtype.str,
+        }
+        if frequency is not None:
+            np.save(self.path / 'frequency.npy', np.asarray(frequency))
+        (self.path / 'meta.json').write_text(json.dumps(self._meta))
+
+    def _write(self, name, values):
+        fd = self._files.get(name, None)
+        if fd is None:
+            fd = self._files[name] = open(self.path / name, 'ab')
+
+        # bound the size of temporary copies of strided views
+        for i in range(0, values.shape[0], self.WRITE_ROWS):
+            fd.write(np.ascontiguousarray(values[i : i + self.WRITE_ROWS]).data)
@@ -0,0 +1,113 @@
+"""Host-side index of the state files that instruments keep in an on-instrument cache"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Union
+
+__all__ = ['StateCacheIndex']
+
+
+class StateCacheIndex:
+    """A persistent record of the state cache entries saved on one instrument.
+
+    The index lets the host know whether a cached state file exists on the instrument
+    without querying its file catalog, and evicts the least recently used entries
+    once there are more than `max_entries`.
+
+    The index file is a JSON mapping of instrument identity to a mapping of entry
+    names to the time of last use. The file may be shared by several instruments
+    and processes; it is re-read before each update so that only the entries of
+    this instrument are replaced.
+
+    Arguments:
+        path: location of the JSON index file on the host
+        instrument: a key unique to the instrument (such as make, model, and serial number)
+        max_entries: the number of entries to keep before evicting the least recently used
+    """
+
+    def __init__(self, path: Union[str, Path], instrument: str, max_entries: int = 32):
+        self.path = Path(path)
+        self.instrument = instrument
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+        self._entries = self._read().get(instrument, {})
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name: str):
+        return name in self._entries
+
+    def __repr__(self):
+        return f'{type(self).__name__}({str(self.path)!r}, {self.instrument!r})'
+
+    def lookup(self, name: str) -> bool:
+        """Return whether `name` is in the index, and mark it as used if it is."""
+        if name not in self._entries:
+            self.misses += 1
+            return False
+
+        self.hits += 1
+        self._entries[name] = time.time()
+        self._write()
+        return True
+
+    def add(self, name: str) -> list[str]:
+        """Add (or refresh) an entry.
+
+        Returns:
+            the names of entries that were evicted to make room, which should be deleted from the instrument
+        """
+        self._entries[name] = time.time()
+
+        by_age = sorted(self._entries, key=self._entries.__getitem__)
+        evicted = by_age[: max(len(by_age) - self.max_entries, 0)]
+        for old in evicted:
+            del self._entries[old]
+        self.evictions += len(evicted)
+
+        self._write()
+        return evicted
+
+    def discard(self, name: str):
+        """Remove an entry that turned out to be missing on the instrument."""
+        if self._entries.pop(name, None) is not None:
+            # the lookup was counted as a hit
+            self.hits -= 1
+            self.misses += 1
+            self.stale += 1
+            self._write()
+
+    def stats(self) -> dict[str, int]:
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            stale=self.stale,
+            evictions=self.evictions,
+            entries=len(self._entries),
+        )
+
+    def _read(self) -> dict:
+        try:
+            return json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            # corrupted index: start over, which at worst costs cache misses
+            return {}
+
+    def _write(self):
+        index = self._read()
+        index[self.instrument] = self._entries
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps(index, indent=1))
+        os.replace(tmp, self.path)
@@ -0,0 +1,68 @@
+"""Host-side mirror of instrument settings, for drivers that have exclusive control"""
+
+import labbench as lb
+from typing import Any, Callable, Union
+
+__all__ = ['StateMirror']
+
+
+class StateMirror:
+    """Mirror the values of selected attributes of a device as they are set or queried.
+
+    When the mirror is trusted (`device.trusted_mirror` is True), `get` returns the last
+    value set or queried through the driver, instead of querying the instrument again.
+    This is only valid while no other connection or front panel user changes the
+    settings; the driver clears the mirror after operations that change many settings
+    at once (such as presets), and `clear` can be called after changes made by other
+    means.
+
+    Arguments:
+        device: the device whose attributes are mirrored
+        names: names of the attributes to mirror; names the device does not define are skipped
+    """
+
+    def __init__(self, device: lb.Device, names: tuple[str, ...]):
+        self.device = device
+        self.names = tuple(name for name in names if hasattr(type(device), name))
+        self.values = {}
+        self.hits = 0
+        self.misses = 0
+
+        lb.paramattr.observe(device, self._on_change, name=list(self.names), type_=('set', 'get'))
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.names!r})'
+
+    def get(self, name: str, query: Union[Callable[[], Any], None] = None) -> Any:
+        """Return the mirrored value of an attribute, or get it from the device.
+
+        Arguments:
+            name: the name of the attribute
+            query: callable that gets the value from the instrument, or None to get the attribute
+        """
+        if not self.device.trusted_mirror or name not in self.names:
+            return getattr(self.device, name) if query is None else query()
+
+        if name in self.values:
+            # each hit is a query that was not needed
+            self.hits += 1
+            return self.values[name]
+
+        self.misses += 1
+        value = getattr(self.device, name) if query is None else query()
+        self.values[name] = value
+        return value
+
+    def clear(self):
+        """Discard all mirrored values, so that each is queried again on next use."""
+        self.values.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'queries_saved': self.hits,
+            'misses': self.misses,
+            'entries': len(self.values),
+        }
+
+    def _on_change(self, msg):
+        self.values[msg['name']] = msg['new']
@@ -0,0 +1,194 @@
+"""Background acquisition of repeated triggered traces into a bounded ring buffer"""
+
+import threading
+import time
+import labbench as lb
+import typing
+from typing import Callable, Union
+
+if typing.TYPE_CHECKING:
+    import numpy as np
+else:
+    # delayed import for speed
+    np = lb.util.lazy_import('numpy')
+
+__all__ = ['TraceStream']
+
+
+class TraceStream:
+    """Acquire traces on a background thread, and iterate through them in order.
+
+    Traces are copied into a preallocated ring buffer of shape (`capacity`, trace
+    points), which is allocated when the first trace arrives. Acquisition never
+    waits for the consumer: when the buffer is full, the oldest trace is overwritten
+    and counted in `overruns`.
+
+    Each item is a tuple `(timestamp, trace)`, where `timestamp` is the host time
+    (in s since the epoch) when the trace finished transferring, and `trace` is a copy
+    of the buffered trace. The time at which the trace was armed is recorded in
+    `arm_times` of the most recent `capacity` traces, for bounding the trigger time.
+
+    Arguments:
+        arm: callable that arms the next acquisition
+        fetch: callable that returns the next trace as a 1-D array
+        capacity: the number of traces in the ring buffer
+        count: the number of traces to acquire, or None for no limit
+        duration: the time to spend acquiring (in s), or None for no limit
+        dtype: the data type of the ring buffer
+    """
+
+    def __init__(
+        self,
+        arm: Callable[[], None],
+        fetch: Callable[[], 'np.ndarray'],
+        capacity: int = 64,
+        count: Union[int, None] = None,
+        duration: Union[float, None] = None,
+        dtype='float32',
+    ):
+        self.arm = arm
+        self.fetch = fetch
+        self.capacity = capacity
+        self.count = count
+        self.duration = duration
+        self.dtype = dtype
+
+        self.buffer = None
+        self.timestamps = np.full(capacity, np.nan)
+        self.arm_times = np.full(capacity, np.nan)
+
+        self.acquired = 0
+        self.consumed = 0
+        self.overruns = 0
+
+        self._read = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._done = False
+        self._exception = None
+        self._thread = None
+
+    def __enter__(self):
+        if self._thread is None:
+            self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def __iter__(self):
+        while True:
+            item = self.get()
+            if item is None:
+                return
+            yield item
+
+    def __repr__(self):
+        return (
+            f'{type(self).__name__}(acquired={self.acquired}, '
+            f'consumed={self.consumed}, overruns={self.overruns})'
+        )
+
+    def start(self):
+        """Start acquiring on the background thread."""
+        if self._thread is not None:
+            raise RuntimeError('the stream has already been started')
+
+        self._thread = threading.Thread(
+            target=self._run, name=type(self).__name__, daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Union[float, None] = None):
+        """Stop acquiring after the trace in progress, and wait for the thread to finish.
+
+        Arguments:
+            timeout: the maximum time to wait for the thread (in s), or None to wait indefinitely
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def get(self, timeout: Union[float, None] = None) -> Union[tuple, None]:
+        """Return the oldest unread `(timestamp, trace)`, waiting for it if necessary.
+
+        Arguments:
+            timeout: the maximum time to wait (in s), or None to wait indefinitely
+
+        Returns:
+            the next item, or None when acquisition has finished and all traces are read
+
+        Raises:
+            TimeoutError: if no trace arrived within `timeout`
+        """
+        with self._cond:
+            if not self._cond.wait_for(
+                lambda: self._read < self.acquired or self._done, timeout
+            ):
+                raise TimeoutError('no trace acquired before timeout')
+
+            if self._read == self.acquired:
+                if self._exception is not None:
+                    raise self._exception
+                return None
+
+            i = self._read % self.capacity
+            item = float(self.timestamps[i]), self.buffer[i].copy()
+            self._read += 1
+            self.consumed += 1
+
+        return item
+
+    @property
+    def pending(self) -> int:
+        """the number of acquired traces that have not been read"""
+        return self.acquired - self._read
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'acquired': self.acquired,
+            'consumed': self.consumed,
+            'pending': self.pending,
+            'overruns': self.overruns,
+        }
+
+    def _run(self):
+        t0 = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                if self.count is not None and self.acquired >= self.count:
+                    break
+                if self.duration is not None and time.perf_counter() - t0 >= self.duration:
+                    break
+
+                arm_time = time.time()
+                self.arm()
+                trace = self.fetch()
+                self._put(np.atleast_1d(trace), arm_time, time.time())
+        except BaseException as ex:
+            self._exception = ex
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+    def _put(self, trace, arm_time, timestamp):
+        if self.buffer is None:
+            self.buffer = np.empty((self.capacity, trace.size), dtype=self.dtype)
+        elif trace.size != self.buffer.shape[1]:
+            raise ValueError(
+                f'trace size changed from {self.buffer.shape[1]} to {trace.size} points'
+            )
+
+        with self._cond:
+            if self.acquired - self._read == self.capacity:
+                # full: overwrite the oldest unread trace
+                self._read += 1
+                self.overruns += 1
+
+            i = self.acquired % self.capacity
+            self.buffer[i] = trace
+            self.timestamps[i] = timestamp
+            self.arm_times[i] = arm_time
+            self.acquired += 1
+            self._cond.notify_all()
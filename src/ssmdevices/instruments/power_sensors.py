@@ -1,13 +1,18 @@
 # -*- coding: utf-8 -*-
 
-from __future__ import annotations
 import labbench as lb
 from labbench import paramattr as attr
 import typing
 import warnings
+import collections
 import contextlib
+import re
+import threading
 import time
-import pyvisa
+from ._completion import CompletionWaiter
+from ._power_stats import PowerStatistics
+from ._state_mirror import StateMirror
+from ._trace_stream import TraceStream
 
 if typing.TYPE_CHECKING:
     import pandas as pd
@@ -23,6 +28,9 @@ __all__ = [
     'RohdeSchwarzNRP8s',
     'RohdeSchwarzNRP18s',
     'PowerTrace_RohdeSchwarzNRP',
+    'PowerSensorGroup',
+    'PowerStatistics',
+    'TraceStream',
 ]
 
 bus_kwarg = attr.method_kwarg.int('bus', min=1, max=4, help='subsystem bus index')
@@ -36,6 +44,37 @@ class KeysightU2000XSeries(lb.VISADevice):
     # used for automatic connection
     make = attr.value.str('Keysight Technologies', inherit=True)
 
+    trusted_mirror: bool = attr.value.bool(
+        False,
+        help='whether to trust host-side copies of settings in fetch (only with exclusive instrument control)',
+    )
+
+    error_check: str = attr.value.str(
+        'call',
+        only=('call', 'count', 'interval', 'exit'),
+        help="when to check the error queue in checked calls: each 'call', every 'count' calls, at an 'interval', or only on 'exit'",
+    )
+    error_check_count: int = attr.value.int(
+        10, min=1, help="the number of checked calls between error checks when error_check == 'count'"
+    )
+    error_check_interval: float = attr.value.float(
+        1.0,
+        min=0,
+        label='s',
+        help="the minimum time between error checks when error_check == 'interval'",
+    )
+
+    # settings read by fetch, which are served from the host when trusted_mirror is set
+    _MIRROR_ATTRS = ('detector_function', 'sweep_aperture')
+
+    # the number of commands kept for error reports, and of errors to read per query
+    _ERROR_WINDOW_SIZE = 32
+    _ERROR_QUERY_BATCH = 4
+
+    # the commands sent since the last error check, set up on open
+    _error_window = None
+    _unchecked_commands = 0
+
     def open(self):
         if type(self) is KeysightU2000XSeries:
             warnings.warn(
@@ -45,9 +84,29 @@ class KeysightU2000XSeries(lb.VISADevice):
                 DeprecationWarning,
             )
 
+        self._error_window = collections.deque(maxlen=self._ERROR_WINDOW_SIZE)
+        self._unchecked_commands = 0
+        self._unchecked_calls = 0
+        self._last_error_check = time.perf_counter()
+
         self._clear()
         self._event_status_enable()
         self._format = 'REAL'
+        self._completion = CompletionWaiter(self, fallback='poll')
+        self._mirror = StateMirror(self, self._MIRROR_ATTRS)
+
+    def close(self):
+        if self._unchecked_commands > 0 and self.error_check != 'call':
+            # deferred checks
+            self.validate_status()
+
+    def write(self, msg: str, *args, **kws):
+        self._record_command(msg)
+        return super().write(msg, *args, **kws)
+
+    def query(self, msg: str, *args, **kws) -> str:
+        self._record_command(msg)
+        return super().query(msg, *args, **kws)
 
     initiate_continuous = attr.property.bool(
         key='INIT:CONT', help='whether to enable triggering to acquire power samples'
@@ -136,6 +195,7 @@ class KeysightU2000XSeries(lb.VISADevice):
         """restore the instrument to its default state"""
         self.write('SYST:PRES')
         self.wait()
+        self._mirror.clear()
         self._clear()
         self._event_status_enable()
         self._format = 'REAL'
@@ -153,14 +213,9 @@ class KeysightU2000XSeries(lb.VISADevice):
         """
 
         if precheck:
-            self.validate_status()
+            self._check_status()
 
-        if kws.get('quiet', False):
-            self.backend.write(f'FETC{bus}?')
-        else:
-            self.write(f'FETC{bus}?')
-        d = self.backend.read_raw()
-        values = np.frombuffer(d[:-1], dtype='>f8') * 1000
+        values = self._fetch_buffer(bus, quiet=kws.get('quiet', False))
 
         if len(values) == 1:
             return float(values[0])
@@ -168,13 +223,15 @@ class KeysightU2000XSeries(lb.VISADevice):
             return values
 
         if kws.get('quiet', False):
-            mode = self.backend.query('DET:FUNC?')
+            mode = self._mirror.get(
+                'detector_function', lambda: self.backend.query('DET:FUNC?')
+            )
         else:
-            mode = self.detector_function
+            mode = self._mirror.get('detector_function')
         if mode == 'NORM':
             index = pd.Index(np.arange(len(values)), name='Power sample index')
         else:
-            time_step = self.sweep_aperture
+            time_step = self._mirror.get('sweep_aperture')
             index = pd.Index(
                 np.arange(len(values)) * time_step, name='Time elapsed (s)'
             )
@@ -204,7 +261,7 @@ class KeysightU2000XSeries(lb.VISADevice):
         self.sweep_aperture = aperture  # longest capture
         self.frequency = frequency
         self.initiate_continuous = initiate_continuous
-        self.validate_status()
+        self._check_status()
 
     def setup_peak_average(
         self,
@@ -229,7 +286,7 @@ class KeysightU2000XSeries(lb.VISADevice):
         self.frequency = frequency
         self.initiate_continuous = initiate_continuous
         self.trigger_source = trigger_source
-        self.validate_status()
+        self._check_status()
 
     def initiate_single(self):
         self.write('INIT:IMM')
@@ -237,43 +294,102 @@ class KeysightU2000XSeries(lb.VISADevice):
     def _force_trigger(self):
         self.write('TRIG')
 
-    def accumulate(self, duration: float, bypass_trigger=False) -> float | tuple:
-        self.validate_status()
+    def accumulate(self, duration: float, bypass_trigger=False) -> typing.Union[float, tuple]:
+        """return the mean power (and, in peak-and-average mode, the peak power) in dBm
+        of the readings acquired over `duration` seconds.
 
-        init_each = not self.initiate_continuous
-        measure_peak = self.detector_function == 'NORM'
+        See :meth:`acquire_statistics` to acquire at the full sample rate of the sensor.
+        """
+        self._check_status()
 
-        averages = []
-        peaks = []
-        t0 = time.perf_counter()
+        stats = self.acquire_statistics(duration, trigger_count=None)
 
-        i = 0
-        fetch_kws = {'precheck': False, 'as_series': False, 'quiet': True}
+        if self._mirror.get('detector_function') == 'NORM':
+            return stats.mean, stats.peak
+        else:
+            return stats.mean
 
-        while True:
-            if init_each:
-                self.backend.write('INIT:IMM')
+    def acquire_statistics(
+        self,
+        duration: float,
+        *,
+        trigger_count: typing.Union[int, None] = 200,
+        stats: typing.Union[PowerStatistics, None] = None,
+        histogram_edges: typing.Union['np.ndarray', None] = None,
+    ) -> PowerStatistics:
+        """acquire whole buffers of power readings for `duration` seconds, folding
+        each into running statistics as it arrives.
 
-            average = self.fetch(bus=1, **fetch_kws).mean()
-            averages.append(average)
+        Each buffer holds `trigger_count` readings, which are transferred with a single
+        binary fetch. In continuous trigger mode (`initiate_continuous`), each fetch
+        waits for the next buffer; otherwise, each buffer is initiated with the fetch
+        query in the same message. Memory use does not grow with `duration`.
 
-            if measure_peak:
-                peak = self.fetch(bus=2, **fetch_kws).max()
-                peaks.append(peak)
+        In peak-and-average mode (`detector_function == 'NORM'`), the peak is taken
+        from the peak readings on the second measurement bus.
 
-            i += 1
+        Arguments:
+            duration: the minimum acquisition time (in s)
+            trigger_count: the number of readings per buffer (up to 200), or None to use the current setting; the previous setting is restored on return
+            stats: statistics to update, or None to start new statistics
+            histogram_edges: histogram bin edges (in dBm) for new statistics, or None for no histogram
+
+        Returns:
+            the updated statistics, including the achieved sample rate
+        """
+        if stats is None:
+            stats = PowerStatistics(histogram_edges)
+
+        if trigger_count is None:
+            return self._acquire_statistics(duration, stats)
+
+        prev_trigger_count = self.trigger_count
+        self.trigger_count = trigger_count
+        try:
+            return self._acquire_statistics(duration, stats)
+        finally:
+            if prev_trigger_count != trigger_count:
+                self.trigger_count = prev_trigger_count
+
+    def _acquire_statistics(
+        self, duration: float, stats: PowerStatistics
+    ) -> PowerStatistics:
+        init_each = not self.initiate_continuous
+        measure_peak = self._mirror.get('detector_function') == 'NORM'
+
+        t0 = time.perf_counter()
+        stats.start()
+
+        while True:
+            averages = self._fetch_buffer(1, quiet=True, initiate=init_each)
+            if measure_peak:
+                peaks = self._fetch_buffer(2, quiet=True)
+            else:
+                peaks = None
+            stats.update(averages, peaks)
 
             if time.perf_counter() - t0 >= duration:
                 break
 
-        self._logger.debug(f'accumulated readings from {i} triggers')
+        self._logger.debug(
+            f'acquired {stats.count} readings in {stats.buffers} buffers '
+            f'({stats.sample_rate:0.1f} readings/s)'
+        )
+
+        return stats
 
-        average = 10 * np.log10(np.abs(np.mean(averages)))
-        if measure_peak:
-            peak = 10 * np.log10(np.abs(np.max(peaks)))
-            return average, peak
+    def _fetch_buffer(
+        self, bus: int = 1, quiet: bool = False, initiate: bool = False
+    ) -> 'np.ndarray':
+        """return the binary readings of the measurement buffer in mW"""
+        msg = f'INIT:IMM;:FETC{bus}?' if initiate else f'FETC{bus}?'
+        if quiet:
+            self._record_command(msg)
+            self.backend.write(msg)
         else:
-            return average
+            self.write(msg)
+        d = self.backend.read_raw()
+        return np.frombuffer(d[:-1], dtype='>f8') * 1000
 
     def zero(self):
         with self.overlap_and_block(30):
@@ -285,12 +401,11 @@ class KeysightU2000XSeries(lb.VISADevice):
 
     @contextlib.contextmanager
     def overlap_and_block(self, timeout=None, quiet=False):
-        """context manager that sends '*OPC' on entry, and performs
-        a blocking '*OPC?' query on exit.
+        """context manager that waits on exit until the commands sent in the block are complete.
 
-        These SCPI commands instruct the sensor to execute the commands
-        concurrently. On exit out of the python context block, execution
-        blocks until all of the commands have completed.
+        The sensor executes the commands concurrently. On exit out of the python
+        context block, '*OPC' is sent, and execution blocks until all of the
+        commands have completed.
 
         Example::
 
@@ -303,33 +418,39 @@ class KeysightU2000XSeries(lb.VISADevice):
             quiet: Suppress timeout exceptions if this evaluates as True
 
         Raises:
-            TimeoutError: on '*OPC?' query timeout
+            TimeoutError: on timeout
         """
 
-        self._opc = True
+        self._completion.arm()
         yield
-        self._opc = False
 
-        self._await_completion(timeout)
+        if quiet:
+            with contextlib.suppress(TimeoutError), self.suppress_timeout():
+                self._await_completion(timeout)
+        else:
+            self._await_completion(timeout)
 
     def _await_completion(self, timeout: float = None):
         if timeout is None:
             timeout = self.timeout
 
-        # monitoring *ESR? is recommended by the programming manual
-        t0 = time.perf_counter()
-        while timeout is None or time.perf_counter() - t0 < timeout:
-            try:
-                register = int(self.backend.query('*ESR?'))
-                time.sleep(0.1)
-            except pyvisa.errors.VisaIOError as ex:
-                raise ex
-            else:
-                if register & 1:
-                    # first bit == operation complete
-                    break
-        else:
-            raise TimeoutError('command failed')
+        # monitoring *ESR? is recommended by the programming manual. this is
+        # done by service request where supported, otherwise by polling
+        self._completion.wait(timeout)
+
+    def get_completion_latency(self) -> 'pd.Series':
+        """Return a histogram of the time spent waiting for operations to complete
+        in :meth:`overlap_and_block`.
+        """
+        return self._completion.histogram()
+
+    def resync(self):
+        """discard host-side copies of instrument settings, so that each is queried again on next use"""
+        self._mirror.clear()
+
+    def get_mirror_stats(self) -> dict[str, int]:
+        """Return counters of the queries that were saved by `trusted_mirror`."""
+        return self._mirror.stats()
 
     def _clear(self):
         self.write('*CLS')
@@ -338,13 +459,71 @@ class KeysightU2000XSeries(lb.VISADevice):
         self.write('*ESE 1')
 
     def validate_status(self):
-        code, text = self.query('SYST:ERR?', timeout=5, retry=True).split(',', 1)
-        code = int(code)
+        """drain the error queue, and raise an exception if it held any errors.
+
+        Raises:
+            IOError: with the code of the first error, and a message that lists all of the errors together with the commands sent since the previous check
+        """
+        window = list(self._error_window)
+        command_count = self._unchecked_commands
+
+        errors = self._drain_errors()
+
+        self._error_window.clear()
+        self._unchecked_commands = 0
+        self._unchecked_calls = 0
+        self._last_error_check = time.perf_counter()
 
-        if code == 0:
+        if len(errors) == 0:
             return
+
+        code, text = errors[0]
+        if len(errors) > 1:
+            text += '; then ' + '; '.join(f'{c}: {t}' for c, t in errors[1:])
+        if command_count > len(window):
+            text += f' (after {command_count} commands, ending with {window})'
+        else:
+            text += f' (after commands {window})'
+
+        raise IOError(code, text)
+
+    def _check_status(self):
+        """check the error queue according to the `error_check` policy"""
+        policy = self.error_check
+        self._unchecked_calls += 1
+
+        if policy == 'call':
+            due = True
+        elif policy == 'count':
+            due = self._unchecked_calls >= self.error_check_count
+        elif policy == 'interval':
+            due = time.perf_counter() - self._last_error_check >= self.error_check_interval
         else:
-            raise IOError(code, text[1:-1])
+            due = False
+
+        if due:
+            self.validate_status()
+
+    def _drain_errors(self) -> list[tuple[int, str]]:
+        """read entries from the error queue until it is empty, several per query"""
+        msg = ';:'.join(['SYST:ERR?'] * self._ERROR_QUERY_BATCH)
+        errors = []
+
+        while True:
+            response = self.query(msg, timeout=5, retry=True)
+            entries = re.findall(r'([+-]?\d+),"([^"]*)"', response)
+            if len(entries) == 0:
+                raise IOError(f'unexpected response to error queue query: {response!r}')
+
+            for code, text in entries:
+                if int(code) == 0:
+                    return errors
+                errors.append((int(code), text))
+
+    def _record_command(self, msg: str):
+        if self._error_window is not None:
+            self._error_window.append(msg)
+            self._unchecked_commands += 1
 
 
 class KeysightU2044XA(KeysightU2000XSeries):
@@ -431,42 +610,106 @@ class RohdeSchwarzNRPSeries(lb.VISADevice):
     average_enable = attr.property.bool(key='AVER')
     smoothing_enable = attr.property.bool(key='SMO:STAT', gets=False)
 
+    format = attr.property.str(
+        key='FORM', only=('ASC', 'REAL,32', 'REAL,64'), case=False
+    )
+    byte_order = attr.property.str(
+        key='FORM:BORD',
+        only=('NORM', 'SWAP'),
+        case=False,
+        help="binary byte order ('NORM' for little-endian or 'SWAP' for big-endian)",
+    )
+
     # Local settings traits (leave command unset, and do not implement setter/getter)
     read_termination: str = attr.value.str('\n', inherit=True)
 
+    # changes to these invalidate the host cache of the trace timebase
+    _TIMEBASE_ATTRS = ('trace_time', 'trace_points')
+
+    def open(self):
+        self._timebase = None
+        lb.paramattr.observe(
+            self, self._on_timebase_change, name=list(self._TIMEBASE_ATTRS), type_=('set', 'get')
+        )
+        lb.paramattr.observe(self, self._on_format_change, name='format', type_=('set', 'get'))
+        self._setup_transfer()
+
+    def _setup_transfer(self):
+        # binary transfers; *RST and *PRE restore ASCII. on R&S sensors, 'NORM'
+        # is little-endian, which matches the decoding in _query_block
+        self.format = 'REAL,32'
+        self.byte_order = 'NORM'
+
+    def _on_timebase_change(self, msg):
+        if msg['type'] == 'set' or msg['new'] != msg['old']:
+            self.clear_host_cache()
+
+    def _on_format_change(self, msg):
+        # track the format on the host, to avoid a query before each fetch
+        self._datatype = {'REAL,32': 'f', 'REAL,64': 'd'}.get(msg['new'].upper(), None)
+
+    def clear_host_cache(self):
+        """discard the host-side cache of the trace timebase.
+
+        This is invalidated automatically when `trace_time` or `trace_points` are set through
+        this object. Call this after they are changed by other means.
+        """
+        self._timebase = None
+
     def preset(self):
         self.write('*PRE')
+        self.clear_host_cache()
+        self._setup_transfer()
 
     def trigger_single(self):
         self.write('INIT')
 
+    def initiate_single(self):
+        self.write('INIT')
+
     def reset(self):
         self.write('*RST')
+        self.clear_host_cache()
+        self._setup_transfer()
 
-    def fetch(self, as_pandas=True) -> typing.Union['pd.Series', float]:
-        """Return a single number or pandas Series containing the power readings"""
-        if as_pandas:
-            container = pd.Series
+    def fetch(self, as_pandas=True) -> typing.Union['pd.Series', 'np.ndarray', float]:
+        """Return a single number or pandas Series containing the power readings.
+
+        The readings are transferred as a binary block. The time index of traces is
+        cached on the host until `trace_time` or `trace_points` are set through this object.
+
+        Arguments:
+            as_pandas: if True, return a Series indexed by time (in s); otherwise, a numpy array
+        """
+        values = self._query_block('FETC?')
+        if len(values) == 1:
+            return float(values[0])
+        elif not as_pandas:
+            return values
+
+        return pd.Series(values, index=self._get_timebase(len(values)), name='Power (dBm)')
+
+    def fetch_buffer(self) -> typing.Union['pd.Series', float]:
+        """Return a single number or pandas Series containing the buffered power readings"""
+        values = self._query_block('FETC:ARR?')
+        if len(values) == 1:
+            return float(values[0])
         else:
-            container = np.ndarray
+            return pd.Series(values)
 
-        series = self.query_ascii_values('FETC?', container=container)
-        if len(series) == 1:
-            return float(series.iloc[0])
-        series.index = np.arange(len(series)) * (
-            self.trace_time / float(self.trace_points)
+    def _query_block(self, msg: str) -> 'np.ndarray':
+        if self._datatype is None:
+            return self.backend.query_ascii_values(msg, container=np.array)
+        return self.backend.query_binary_values(
+            msg, datatype=self._datatype, is_big_endian=False, container=np.array
         )
-        series.name = 'Power (dBm)'
-        return series
-
-    def fetch_buffer(self):
-        """Return a single number or pandas Series containing the power readings"""
-        response = self.query('FETC:ARR?').split(',')
-        if len(response) == 1:
-            return float(response[0])
-        else:
-            index = None  # np.arange(len(response))*(self.trace_time/float(self.trace_points))
-            return pd.to_numeric(pd.Series(response, index=index))
+
+    def _get_timebase(self, count: int) -> 'pd.Index':
+        if self._timebase is None or len(self._timebase) != count:
+            # trace_points is not queryable, so the step is taken from the trace length
+            step = self.trace_time / float(count)
+            self._timebase = pd.Index(np.arange(count) * step, name='Time elapsed (s)')
+        return self._timebase
 
     def setup_trace(
         self,
@@ -549,6 +792,257 @@ class PowerTrace_RohdeSchwarzNRP(lb.Rack):
         self.sensor.initiate_continuous = False
         self.sensor.wait()
 
+    def stream_traces(
+        self,
+        capacity: int = 64,
+        count: typing.Union[int, None] = None,
+        duration: typing.Union[float, None] = None,
+    ) -> TraceStream:
+        """start acquiring traces continuously on a background thread.
+
+        Each trace is armed with `initiate_single` as soon as the previous one has been
+        fetched, and buffered in a ring buffer that holds `capacity` traces. Traces that
+        are overwritten before they are read are counted in the `overruns` of the stream.
+        Call `setup_trace` first.
+
+        Example::
+
+            with rack.stream_traces(capacity=256, duration=60) as stream:
+                for timestamp, trace in stream:
+                    process(trace)
+            print(stream.stats())
+
+        Arguments:
+            capacity: the number of traces in the ring buffer
+            count: the number of traces to acquire, or None for no limit
+            duration: the time to spend acquiring (in s), or None for no limit
+
+        Returns:
+            the running stream, which yields `(timestamp, trace)` tuples when iterated
+        """
+        stream = TraceStream(
+            arm=self.sensor.initiate_single,
+            fetch=lambda: self.sensor.fetch(as_pandas=False),
+            capacity=capacity,
+            count=count,
+            duration=duration,
+        )
+        stream.start()
+        return stream
+
+
+class PowerSensorGroup:
+    """Acquire from several power sensors for the same event.
+
+    The sensors are armed together, either to wait for a shared external trigger
+    (`trigger_source='EXT'`), or with `initiate_single` calls that are released at
+    the same time from a pool of worker threads (`trigger_source='IMM'`). The
+    readings are then fetched concurrently on the same pool, and merged into one
+    DataFrame of power in dBm that is aligned on the sample number of each reading.
+
+    Example::
+
+        sensors = {'input': KeysightU2044XA('USB0::...'), 'output': RohdeSchwarzNRP18s('RSNRP::...')}
+
+        with PowerSensorGroup(sensors, trigger_source='EXT') as group:
+            for i in range(10):
+                group.arm()
+                data = group.fetch()
+        print(group.latency())
+
+    Arguments:
+        sensors: mapping of names to sensor devices, or a sequence of devices (named by their index)
+        trigger_source: 'EXT' to arm each sensor for an external trigger, 'IMM' to initiate each immediately, or None to leave the trigger configuration unchanged
+        precheck: whether to check the error queue of each sensor before fetching, where supported
+    """
+
+    def __init__(
+        self,
+        sensors: typing.Union[dict, list],
+        trigger_source: typing.Union[str, None] = 'IMM',
+        precheck: bool = False,
+    ):
+        if trigger_source not in ('EXT', 'IMM', None):
+            raise ValueError(
+                f"trigger_source must be 'EXT', 'IMM', or None, not {trigger_source!r}"
+            )
+
+        if not isinstance(sensors, dict):
+            sensors = {str(i): sensor for i, sensor in enumerate(sensors)}
+        self.sensors = dict(sensors)
+        self.trigger_source = trigger_source
+        self.precheck = precheck
+
+        self._executor = None
+        self._context = None
+        self._trigger_time = None
+        self._arm_times = {}
+        self._latency = {}
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return f'{type(self).__name__}({list(self.sensors)!r})'
+
+    def open(self):
+        """Open any closed sensors concurrently, and configure their trigger."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        closed = [sensor for sensor in self.sensors.values() if not sensor.isopen]
+        if len(closed) > 0:
+            self._context = lb.concurrently(*closed)
+            self._context.__enter__()
+
+        self._executor = ThreadPoolExecutor(
+            len(self.sensors), thread_name_prefix=type(self).__name__
+        )
+
+        if self.trigger_source is not None:
+            self._map(self._setup_trigger)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._context is not None:
+            self._context.__exit__(None, None, None)
+            self._context = None
+
+    def arm(self):
+        """Initiate all sensors together.
+
+        The initiate commands are released to all worker threads at once, and the
+        time each was sent is recorded for :meth:`latency`.
+        """
+        barrier = threading.Barrier(len(self.sensors))
+
+        def initiate(sensor):
+            barrier.wait()
+            sensor.initiate_single()
+            return time.perf_counter()
+
+        self._trigger_time = time.time()
+        self._arm_times = self._map(initiate)
+
+    def fetch(self) -> 'pd.DataFrame':
+        """Fetch readings from all sensors concurrently.
+
+        Returns:
+            readings converted to dBm, in columns named `'<sensor name> (dBm)'`.
+            The index levels are the trigger timestamp of the last :meth:`arm`
+            and the sample number within the fetch, since the time bases
+            reported by different sensor models do not share sample times;
+            sensors that return fewer readings are padded with NaN.
+        """
+
+        def fetch(sensor):
+            t0 = time.perf_counter()
+            if isinstance(sensor, KeysightU2000XSeries):
+                data = sensor.fetch(precheck=self.precheck)
+            else:
+                data = sensor.fetch()
+            return data, time.perf_counter() - t0
+
+        results = self._map(fetch)
+        self._latency = {name: latency for name, (_, latency) in results.items()}
+
+        columns = []
+        for name, (data, _) in results.items():
+            if isinstance(data, pd.Series):
+                unit = self._power_unit(data.name, self.sensors[name])
+                values = data.values
+            else:
+                unit = self._power_unit(None, self.sensors[name])
+                values = np.atleast_1d(data)
+            columns.append(
+                pd.Series(self._to_dbm(values, unit), name=f'{name} (dBm)')
+            )
+
+        df = pd.concat(columns, axis=1)
+
+        if self._trigger_time is None:
+            trigger_time = pd.NaT
+        else:
+            trigger_time = pd.Timestamp(self._trigger_time, unit='s')
+        df.index = pd.MultiIndex.from_arrays(
+            [np.full(len(df), trigger_time), df.index],
+            names=['Trigger time', 'Sample'],
+        )
+        return df
+
+    @staticmethod
+    def _power_unit(label, sensor) -> str:
+        """return the power unit of a sensor reading from its label (like 'Power (mW)'),
+        falling back on the unit returned by the sensor model"""
+        match = re.search(r'\((dBm|mW|W)\)', label or '')
+        if match is not None:
+            return match.group(1)
+        elif isinstance(sensor, KeysightU2000XSeries):
+            return 'mW'
+        else:
+            return 'dBm'
+
+    @staticmethod
+    def _to_dbm(values, unit: str) -> 'np.ndarray':
+        values = np.asarray(values, dtype='float64')
+        if unit == 'dBm':
+            return values
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dbm = 10 * np.log10(values)
+        if unit == 'W':
+            dbm += 30
+        return dbm
+
+    def acquire(self, count: int = 1) -> 'pd.DataFrame':
+        """Arm and fetch `count` times, and return the concatenated readings."""
+        return pd.concat([self._acquire_once() for i in range(count)], axis=0)
+
+    def latency(self) -> 'pd.DataFrame':
+        """Return the timing of the last acquisition for each sensor.
+
+        The columns are 'arm_skew', the time at which each sensor was initiated
+        relative to the first, and 'fetch', the duration of each fetch (both in s).
+        """
+        if len(self._arm_times) > 0:
+            first = min(self._arm_times.values())
+            skew = {name: t - first for name, t in self._arm_times.items()}
+        else:
+            skew = {}
+
+        df = pd.DataFrame(
+            {
+                'arm_skew': pd.Series(skew, dtype=float),
+                'fetch': pd.Series(self._latency, dtype=float),
+            },
+            index=list(self.sensors),
+        )
+        df.index.name = 'Sensor'
+        return df
+
+    def _acquire_once(self) -> 'pd.DataFrame':
+        self.arm()
+        return self.fetch()
+
+    def _setup_trigger(self, sensor):
+        sensor.initiate_continuous = False
+        sensor.trigger_source = self.trigger_source
+
+    def _map(self, func) -> dict:
+        """call func(sensor) for each sensor on the thread pool"""
+        if self._executor is None:
+            raise ConnectionError(f'{self!r} is not open')
+
+        futures = {
+            name: self._executor.submit(func, sensor)
+            for name, sensor in self.sensors.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
 
 if __name__ == '__main__':
     from matplotlib import pyplot as plt
@@ -1,13 +1,29 @@
 # Authors:
 #   Keith Forsyth and Dan Kuester
 
+import contextlib
 import os
 import time
+from pathlib import Path
 import labbench as lb
 from labbench import paramattr as attr
 import typing
 import typing_extensions
 from typing import Union, Literal
+from ._columnar import ArrowSpectrogram
+from ._completion import CompletionWaiter
+from ._mask_events import MaskEventRecorder
+from ._reducers import (
+    SpectrogramReducer,
+    HoldReducer,
+    MeanReducer,
+    HistogramReducer,
+    OccupancyReducer,
+    _SinkGroup,
+)
+from ._spectrogram import DiskSpectrogram
+from ._state_cache import StateCacheIndex
+from ._state_mirror import StateMirror
 
 if typing.TYPE_CHECKING:
     import pandas as pd
@@ -22,6 +38,14 @@ SeriesType: typing_extensions.TypeAlias = 'pd.Series'
 NumpyArrayType: typing_extensions.TypeAlias = 'np.ndarray'
 
 __all__ = [
+    'ArrowSpectrogram',
+    'DiskSpectrogram',
+    'HistogramReducer',
+    'HoldReducer',
+    'MaskEventRecorder',
+    'MeanReducer',
+    'OccupancyReducer',
+    'SpectrogramReducer',
     'KeysightN9951B',
     'RohdeSchwarzFSW26SpectrumAnalyzer',
     'RohdeSchwarzFSW26IQAnalyzer',
@@ -37,6 +61,42 @@ __all__ = [
 DEFAULT_CHANNEL_NAME = 'remote'
 
 
+def _query_joined(device: lb.VISADevice, msgs: list[str]) -> list[str]:
+    """send several queries in a single message, and return the list of replies"""
+    return device.query(';:'.join(msgs)).split(';')
+
+
+def _visa_timeout_error():
+    from pyvisa.constants import StatusCode
+    from pyvisa.errors import VisaIOError
+
+    return VisaIOError(StatusCode.error_timeout)
+
+
+def _visa_read_into(backend, view: memoryview) -> int:
+    """read up to `view.nbytes` bytes from a pyvisa resource into `view`.
+
+    Returns:
+        the number of bytes received
+    """
+    lib = getattr(backend.visalib, 'lib', None)
+
+    if hasattr(lib, 'viRead'):
+        # ctypes-wrapped VISA libraries: the driver writes straight into `view`
+        import ctypes
+        from pyvisa.ctwrapper.types import ViUInt32
+
+        buf = (ctypes.c_char * view.nbytes).from_buffer(view)
+        count = ViUInt32()
+        lib.viRead(backend.session, buf, view.nbytes, ctypes.byref(count))
+        return count.value
+    else:
+        # other backends (e.g., pyvisa-py) only return new bytes objects
+        raw, _ = backend.visalib.read(backend.session, view.nbytes)
+        view[: len(raw)] = raw
+        return len(raw)
+
+
 @attr.visa_keying(remap={False: '0', True: '1'})
 class KeysightN9951B(lb.VISADevice):
     """A Keysight N9951B "Field Fox".
@@ -70,16 +130,95 @@ class KeysightN9951B(lb.VISADevice):
         key='BAND', min=1e3, max=5.76e6, label='Hz'
     )
 
-    def fetch_trace(self, trace: int = 1) -> DataFrameType:
+    sweep_points = attr.property.int(key='SWE:POIN', min=101, max=10001)
+
+    format = attr.property.str(
+        key='FORM', only=('ASC,0', 'REAL,32', 'REAL,64'), case=False
+    )
+    byte_order = attr.property.str(
+        key='FORM:BORD',
+        only=('NORM', 'SWAP'),
+        case=False,
+        help="binary byte order ('NORM' for big-endian or 'SWAP' for little-endian)",
+    )
+
+    # changes to these invalidate the host cache of the horizontal axis
+    _AXIS_ATTRS = (
+        'frequency_start',
+        'frequency_stop',
+        'frequency_span',
+        'frequency_center',
+        'sweep_points',
+    )
+
+    def open(self):
+        self._axis_cache = {}
+        lb.paramattr.observe(
+            self, self._on_axis_change, name=list(self._AXIS_ATTRS), type_=('set', 'get')
+        )
+        self.format = 'REAL,32'
+        self.byte_order = 'SWAP'
+
+    def _on_axis_change(self, msg):
+        if msg['type'] == 'set' or msg['new'] != msg['old']:
+            self.clear_host_cache()
+
+    def clear_host_cache(self):
+        """discard the host-side cache of trace horizontal axes.
+
+        This is invalidated automatically when the frequency settings are changed through
+        this object. Call this after they are changed by other means (such as the front panel).
+        """
+        self._axis_cache.clear()
+
+    def fetch_trace(self, trace: int = 1, as_pandas: bool = True) -> DataFrameType:
         """Get trace x values and y values using XVAL? and DATA?
 
+        The values are transferred as binary blocks. The x values are transferred in double
+        precision, and cached on the host until the frequency settings are changed through
+        this object.
+
         Arguments:
             trace: which trace to pull from the fieldfox
+            as_pandas: If True, return a DataFrame; otherwise, a tuple of numpy arrays (frequency, power)
+        """
+        x_data = self._axis_cache.get(trace, None)
+        if x_data is None:
+            # single precision would round frequencies to several kHz
+            self.format = 'REAL,64'
+            try:
+                x_data = self._query_block(f'TRAC{trace}:XVAL?', 'd')
+            finally:
+                self.format = 'REAL,32'
+            self._axis_cache[trace] = x_data
+        y_data = self._query_block(f'TRAC{trace}:DATA?')
+
+        if as_pandas:
+            return pd.DataFrame({'Frequency': x_data, 'Power': y_data})
+        else:
+            return x_data, y_data
+
+    def _query_block(self, msg: str, datatype: str = 'f') -> NumpyArrayType:
+        return self.backend.query_binary_values(
+            msg, datatype=datatype, is_big_endian=False, container=np.array
+        )
+
+    def get_marker_table(self, markers: list[int]) -> DataFrameType:
+        """Get the position and value of several markers in a single query transaction.
+
+        Arguments:
+            markers: marker numbers on instrument display, each of which must be enabled
+        Returns:
+            DataFrame indexed by marker number, with columns 'Frequency' and 'Power'
         """
+        msgs = []
+        for m in markers:
+            msgs += [f'CALC:MARK{m}:X?', f'CALC:MARK{m}:Y?']
+        values = np.array(_query_joined(self, msgs), dtype=float).reshape(-1, 2)
 
-        x_data = self.query(f'TRAC{trace}:XVAL?').split(',')
-        y_data = self.query(f'TRAC{trace}:DATA?').split(',')
-        return pd.DataFrame({'Frequency': x_data, 'Power': y_data})
+        table = pd.DataFrame(values, columns=['Frequency', 'Power'], index=list(markers))
+        table.index.name = 'Marker'
+        return table
 
     def get_marker_power(self, marker: int) -> float:
         """Get marker measurement value (on vertical axis)
@@ -122,6 +261,58 @@ class RohdeSchwarzFSWBase(lb.VISADevice):
     _TRIGGER_DIRECTIONS = 'INP', 'OUTP'
     _CHANNEL_TYPES = None, 'SAN', 'IQ', 'RTIM'
     _CACHE_DIR = r'c:\temp\remote-cache'
+    _CACHE_INDEX_PATH = Path.home() / '.ssmdevices' / 'fsw-state-cache.json'
+    _CACHE_MAX_ENTRIES = 32
+    _FORMAT_DTYPES = {
+        'REAL': 'float32',
+        'REAL,16': 'float16',
+        'REAL,32': 'float32',
+        'REAL,64': 'float64',
+    }
+
+    # the current `format` and the numpy dtype of its binary blocks, tracked as it is set
+    _block_format = None
+    _block_dtype = 'float32'
+
+    # instrument settings recorded with exported data by get_state_summary
+    _STATE_SUMMARY_ATTRS = (
+        'channel_type',
+        'frequency_center',
+        'frequency_span',
+        'resolution_bandwidth',
+        'sweep_time',
+        'sweep_points',
+        'input_attenuation',
+        'trigger_source',
+        'trigger_post_time',
+        'sweep_dwell_time',
+    )
+
+    # changes to these invalidate the host cache of horizontal (frequency or time) axes
+    _AXIS_ATTRS = (
+        'channel_type',
+        'frequency_center',
+        'frequency_span',
+        'frequency_start',
+        'frequency_stop',
+        'resolution_bandwidth',
+        'sweep_points',
+        'sweep_time',
+        'sweep_time_window2',
+        'iq_sample_rate',
+        'iq_record_length',
+        'iq_mode',
+        'iq_format',
+    )
+
+    # settings read in fetch loops, which are served from the host when trusted_mirror is set
+    _MIRROR_ATTRS = (
+        'trigger_source',
+        'trigger_post_time',
+        'sweep_dwell_time',
+        'sweep_time',
+        'sweep_time_window2',
+    )
 
     expected_channel_type: str = attr.value.str(
         None,
@@ -137,6 +328,17 @@ class RohdeSchwarzFSWBase(lb.VISADevice):
     default_trace: str = attr.value.str(
         '', cache=True, help='data trace number to use if unspecified'
     )
+    block_chunk_size: int = attr.value.int(
+        1 << 20,
+        min=1,
+        cache=True,
+        help='number of bytes to request in each read of binary block data',
+        label='bytes',
+    )
+    trusted_mirror: bool = attr.value.bool(
+        False,
+        help='whether to trust host-side copies of settings in fetch loops (only with exclusive instrument control)',
+    )
 
     # Set these in subclasses for specific FSW instruments
     frequency_center = attr.property.float(
@@ -190,8 +392,101 @@ class RohdeSchwarzFSWBase(lb.VISADevice):
             )
 
     def open(self):
+        self._host_cache = {}
+        self._state_cache = None
+        self._timestamp_marks = {}
+        self._completion = CompletionWaiter(
+            self, fallback='opc', timeout_error=_visa_timeout_error
+        )
+        self._mirror = StateMirror(self, self._MIRROR_ATTRS)
+        lb.paramattr.observe(
+            self, self._on_channel_change, name='channel_type', type_='set'
+        )
+        lb.paramattr.observe(
+            self, self._on_format_change, name='format', type_=('set', 'get')
+        )
+        lb.paramattr.observe(
+            self,
+            self._on_axis_change,
+            name=[name for name in self._AXIS_ATTRS if hasattr(type(self), name)],
+            type_=('set', 'get'),
+        )
         self.format = 'REAL,32'
 
+    def get_state_summary(self) -> dict:
+        """Query the instrument settings that describe acquired data, for storage alongside it
+        (for example, with :meth:`ArrowSpectrogram.new_segment`).
+
+        Returns:
+            dictionary keyed by attribute name, including 'reference_level' of the default trace
+        """
+        summary = {
+            name: getattr(self, name)
+            for name in self._STATE_SUMMARY_ATTRS
+            if hasattr(type(self), name)
+        }
+        summary['reference_level'] = self.reference_level(trace=self.default_trace or 1)
+        return summary
+
+    @contextlib.contextmanager
+    def overlap_and_block(self, timeout=None, quiet=False):
+        """context manager that waits on exit until the commands sent in the block are complete.
+
+        The wait is event-driven by service request where the VISA transport supports it,
+        and otherwise is a blocking '*OPC?' query. The latency of each wait is recorded
+        (see :meth:`get_completion_latency`).
+
+        Arguments:
+            timeout: maximum time to wait (in s), or None to use `self.backend.timeout`
+            quiet: if True, suppress timeout exceptions
+
+        Raises:
+            pyvisa.errors.VisaIOError: on timeout (suppressed by `self.suppress_timeout()`)
+        """
+        self._completion.arm()
+        yield
+
+        if quiet:
+            with self.suppress_timeout():
+                self._completion.wait(timeout)
+        else:
+            self._completion.wait(timeout)
+
+    def get_completion_latency(self) -> SeriesType:
+        """Return a histogram of the time spent waiting for operations to complete
+        in :meth:`overlap_and_block`.
+        """
+        return self._completion.histogram()
+
+    def clear_host_cache(self, *kinds: str):
+        """discard host-side caches of instrument state.
+
+        These are invalidated automatically when the corresponding settings are
+        changed through this object. Call this after the instrument state is changed
+        by other means (such as the front panel or another connection).
+
+        Arguments:
+            kinds: the names of the caches to clear (for example, 'axis' or 'mirror'), or none to clear all
+        """
+        if len(kinds) == 0 or 'mirror' in kinds:
+            self._mirror.clear()
+        if len(kinds) == 0:
+            self._host_cache.clear()
+        for kind in kinds:
+            self._host_cache.pop(kind, None)
+
+    def resync(self):
+        """discard all host-side copies of instrument state, so that each is queried again on next use"""
+        self.clear_host_cache()
+
+    def get_mirror_stats(self) -> dict[str, int]:
+        """Return counters of the queries that were saved by `trusted_mirror`."""
+        return self._mirror.stats()
+
+    def _on_channel_change(self, msg):
+        # each channel has its own settings
+        self.clear_host_cache('mirror', 'marker_enables')
+
     def acquire_spectrogram(self, acquisition_time_sec):
         t0 = time.time()
 
@@ -210,7 +505,7 @@ class RohdeSchwarzFSWBase(lb.VISADevice):
             t0_active = time.time()
 
             # Try to trigger; block until timeout.
-            with self.overlap_and_block(timeout=int(1e3 * time_remaining)):
+            with self.overlap_and_block(timeout=time_remaining):
                 self.trigger_single(wait=False)
             active_time += time.time() - t0_active
 
@@ -278,22 +573,69 @@ class RohdeSchwarzFSWBase(lb.VISADevice):
             )
 
         self.write(f"MMEM:LOAD:STAT 1,'{path}'")
+        self.clear_host_cache()
         self.wait()
 
     def load_cache(self):
+        """Load the instrument state saved by `save_cache` from the same caller with the same arguments.
+
+        The host-side index of cache entries (see :meth:`state_cache_stats`) is checked
+        first, so that a miss does not touch the instrument, and a hit loads the state file
+        without first querying the instrument file catalog.
+
+        Returns:
+            True if the cached state was loaded, otherwise False
+        """
         cache_name = lb.util.hash_caller(2)
+        index = self._state_cache_index()
 
-        try:
-            self.load_state(cache_name, self._CACHE_DIR)
-        except FileNotFoundError:
+        if not index.lookup(cache_name):
+            return False
+
+        path = self._CACHE_DIR + '\\' + cache_name + '.dfl'
+
+        # load and check for errors in a single round trip
+        esr = int(self.query(f"*CLS;:MMEM:LOAD:STAT 1,'{path}';*WAI;*ESR?"))
+        self.clear_host_cache()
+
+        if esr & 0x3C:
+            # query, device, execution, or command error: the file went missing
+            index.discard(cache_name)
+            self._logger.debug('cached save file was missing on the instrument')
             return False
         else:
             self._logger.debug('Successfully loaded cached save file')
             return True
 
     def save_cache(self):
+        """Save the instrument state into the cache for `load_cache`, evicting stale entries."""
         cache_name = lb.util.hash_caller(2)
-        self.save_state(cache_name, self._CACHE_DIR)
+        index = self._state_cache_index()
+
+        # the index can outlive the directory on the instrument; mkdir is memoized
+        self.mkdir(self._CACHE_DIR)
+        self.save_state(self._CACHE_DIR + '\\' + cache_name)
+
+        for name in index.add(cache_name):
+            self.write(f"MMEM:DEL '{self._CACHE_DIR}\\{name}.dfl'")
+
+    def state_cache_stats(self) -> dict[str, int]:
+        """Return the hit, miss, and eviction counts of the state cache in this session.
+
+        Misses include 'stale' index entries whose files were missing on the instrument.
+        """
+        return self._state_cache_index().stats()
+
+    def _state_cache_index(self) -> StateCacheIndex:
+        index = getattr(self, '_state_cache', None)
+        if index is None:
+            make, model, serial = self._identity.split(',')[:3]
+            index = self._state_cache = StateCacheIndex(
+                self._CACHE_INDEX_PATH,
+                f'{make},{model},{serial}',
+                max_entries=self._CACHE_MAX_ENTRIES,
+            )
+        return index
 
     def mkdir(self, path, recursive=True):
         """Make a new directory (optionally recursively) on the instrument
@@ -307,12 +649,15 @@ class RohdeSchwarzFSWBase(lb.VISADevice):
 
         if recursive:
             subs = path.replace('/', '\\').split('\\')
-            for i in range(1, len(subs) + 1):
-                self.mkdir('\\'.join(subs[:i]), recursive=False)
+            new = ['\\'.join(subs[:i]) for i in range(1, len(subs) + 1)]
+            new = [p for p in new if p not in self.__prev_dirs]
         else:
-            with self.overlap_and_block():
-                self.write(f"MMEM:MDIR '{path}'")
-            self.__prev_dirs.add(path)
+            new = [path]
+
+        # make all of the directories in one transaction
+        with self.overlap_and_block():
+            self.write(';:'.join([f"MMEM:MDIR '{p}'" for p in new]))
+        self.__prev_dirs.update(new)
         return path
 
     def file_info(self, path):
@@ -351,11 +696,24 @@ class RohdeSchwarzFSWBase(lb.VISADevice):
             )
         else:
             self.write(f"INST:CRE {self.channel_type},'{DEFAULT_CHANNEL_NAME}'")
+        self.clear_host_cache()
 
     def channel_preset(self):
         self.write('SYST:PRES:CHAN')
+        self.clear_host_cache()
 
-    def query_ieee_array(self, msg: str) -> NumpyArrayType:
+    def preset(self):
+        super().preset()
+        self.clear_host_cache()
+
+    def query_ieee_array(
+        self,
+        msg: str,
+        out: Union[NumpyArrayType, None] = None,
+        pool: bool = False,
+        dtype=None,
+        chunk_size: Union[int, None] = None,
+    ) -> NumpyArrayType:
         """An alternative to self.backend.query_binary_values for fetching block data. This
         implementation works around slowness between pyvisa and the instrument that seems to
         result from transferring in chunks of size self.backend.chunk_size as implemented
@@ -371,8 +729,16 @@ class RohdeSchwarzFSWBase(lb.VISADevice):
         >>> %timeit -n 1 -r 1 sa.query_ieee_array('TRAC2:DATA? SPEC')
         (~23 sec)
 
+        The block is read in pieces of `chunk_size` bytes directly into the memory of the
+        returned array, so that the transfer needs no more than one chunk of memory beyond
+        the payload itself. Pass `out` to fill an existing array (such as an `np.memmap`) instead.
+
         Arguments:
             msg: The SCPI command to send
+            out: a C-contiguous array to fill with the response, or None to allocate one
+            pool: if True and `out` is None, fill a buffer owned by this instance that is reused (and overwritten) on the next call
+            dtype: data type of the block values, or None to follow the current `format`
+            chunk_size: the number of bytes to request in each read, or None to use `self.block_chunk_size`
         :return: a numpy array containing the response.
         """
 
@@ -391,15 +757,9 @@ class RohdeSchwarzFSWBase(lb.VISADevice):
             with self.backend.ignore_warning(
                 VI_SUCCESS_DEV_NPRESENT, VI_SUCCESS_MAX_CNT
             ):
-                # Reproduce the behavior of pyvisa.util.from_ieee_block without
-                # a priori access to the entire buffer.
-                raw, _ = self.backend.visalib.read(self.backend.session, 2)
-                digits = int(raw.decode('ascii')[1])
-                raw, _ = self.backend.visalib.read(self.backend.session, digits)
-                data_size = int(raw.decode('ascii'))
-
-                # Read the actual data
-                raw, _ = self.backend.visalib.read(self.backend.session, data_size)
+                data = self._read_ieee_block(
+                    out=out, pool=pool, dtype=dtype, chunk_size=chunk_size
+                )
 
                 # Read termination characters so that the instrument doesn't show
                 # a "QUERY INTERRUPTED" error when there is unread buffer
@@ -407,10 +767,125 @@ class RohdeSchwarzFSWBase(lb.VISADevice):
         finally:
             self.backend.read_termination = old_read_term
 
-        data = np.frombuffer(raw, np.float32)
-        self._logger.debug('      -> {} bytes ({} values)'.format(data_size, data.size))
         return data
 
+    def _read_ieee_block(
+        self, out=None, pool=False, dtype=None, chunk_size=None
+    ) -> NumpyArrayType:
+        """read one IEEE-488.2 definite-length block from the open session into an array"""
+
+        if dtype is None:
+            dtype = self._block_dtype
+            if dtype is None:
+                raise ValueError(
+                    f'format is {self.format!r}, but block transfers need a binary format'
+                )
+        dtype = np.dtype(dtype)
+        if chunk_size is None:
+            chunk_size = self.block_chunk_size
+
+        data_size = self._read_ieee_header()
+        count = data_size // dtype.itemsize
+
+        if out is None and pool:
+            out = self._pooled_block_buffer(count * dtype.itemsize).view(dtype)
+        if out is None:
+            out = np.empty(count, dtype=dtype)
+        elif out.dtype != dtype or out.size < count or not out.flags.c_contiguous:
+            self._discard_bytes(data_size, chunk_size)
+            raise ValueError(
+                f'out must be a C-contiguous {dtype} array with at least {count} elements'
+            )
+
+        values = out.reshape(-1)[:count]
+        view = memoryview(values).cast('B')
+        received = 0
+        while received < view.nbytes:
+            stop = min(received + chunk_size, view.nbytes)
+            n = _visa_read_into(self.backend, view[received:stop])
+            if n == 0:
+                raise ConnectionError(
+                    f'block transfer ended after {received} of {view.nbytes} bytes'
+                )
+            received += n
+
+        # any trailing bytes that don't fill a whole value
+        self._discard_bytes(data_size - view.nbytes, chunk_size)
+
+        self._logger.debug(f'      -> {data_size} bytes ({count} values)')
+        return values
+
+    def _read_ieee_header(self) -> int:
+        """read the header of an IEEE-488.2 definite-length block, and return its data size in bytes"""
+        # Reproduce the behavior of pyvisa.util.from_ieee_block without
+        # a priori access to the entire buffer.
+        raw, _ = self.backend.visalib.read(self.backend.session, 2)
+        digits = int(raw.decode('ascii')[1])
+        raw, _ = self.backend.visalib.read(self.backend.session, digits)
+        return int(raw.decode('ascii'))
+
+    def _pooled_block_buffer(self, size: int) -> NumpyArrayType:
+        """return a reusable byte buffer owned by this instance with at least `size` bytes"""
+        pool = getattr(self, '_block_pool', None)
+        if pool is None or pool.size < size:
+            pool = self._block_pool = np.empty(size, dtype=np.uint8)
+        return pool[:size]
+
+    def _discard_bytes(self, count: int, chunk_size: int):
+        while count > 0:
+            raw, _ = self.backend.visalib.read(
+                self.backend.session, min(count, chunk_size)
+            )
+            if len(raw) == 0:
+                raise ConnectionError(
+                    f'block transfer ended with {count} bytes left to discard'
+                )
+            count -= len(raw)
+
+    def _on_format_change(self, msg):
+        self._block_format = str(msg['new']).upper()
+        self._block_dtype = self._FORMAT_DTYPES.get(self._block_format, None)
+
+    def _on_axis_change(self, msg):
+        if msg['type'] == 'set' or msg['new'] != msg['old']:
+            self.clear_host_cache('axis')
+
+    def _cached_horizontal(self, window=None, trace=None) -> NumpyArrayType:
+        """return the horizontal axis from :meth:`fetch_horizontal`, fetching it only
+        if the settings that determine the axis have changed.
+        """
+        key = ('exact', str(window), str(trace))
+        axis = self._host_cache.get('axis', {}).get(key, None)
+
+        if axis is None:
+            if trace is None:
+                axis = self.fetch_horizontal(window)
+            else:
+                axis = self.fetch_horizontal(window, trace)
+            self._host_cache.setdefault('axis', {})[key] = axis
+
+        return axis
+
+    def _fast_frequency_axis(self, window=None) -> NumpyArrayType:
+        """return the frequency axis estimated from FFT parameters, querying them
+        only if they have changed since the last call.
+        """
+        key = ('fast', str(window))
+        axis = self._host_cache.get('axis', {}).get(key, None)
+
+        if axis is None:
+            fc = self.frequency_center
+            fsamp = self.iq_sample_rate
+            Nfreqs = self.sweep_points
+            axis = fc + np.linspace(
+                -fsamp * (1.0 - 1.0 / Nfreqs) / 2,
+                +fsamp * (1.0 - 1.0 / Nfreqs) / 2,
+                Nfreqs,
+            )
+            self._host_cache.setdefault('axis', {})[key] = axis
+
+        return axis
+
     def fetch_horizontal(self, window=None, trace: int = None):
         if window is None:
             window = self.default_window
@@ -450,20 +925,130 @@ class RohdeSchwarzFSWBase(lb.VISADevice):
             trace = self.default_trace
         if window is None:
             window = self.default_window
-        if hasattr(trace, '__iter__'):
-            return pd.concat(
-                [self.fetch_trace(t, horizontal=horizontal) for t in trace]
+        if hasattr(trace, '__iter__') and not isinstance(trace, str):
+            values, index = self.fetch_traces(trace, horizontal=horizontal, window=window)
+            return pd.DataFrame(
+                values.T, columns=[f'Trace {t}' for t in trace], index=index
             )
 
         if horizontal:
-            index = self.fetch_horizontal(trace)
+            index = self._cached_horizontal(window, trace)
             values = self.query_ieee_array(f'TRAC{window}:DATA? TRACE{trace}')
-            return pd.DataFrame(values, columns=['Trace ' + trace], index=index)
+            return pd.DataFrame(values, columns=[f'Trace {trace}'], index=index)
         else:
             values = self.query_ieee_array(f'TRAC{window}:DATA? TRACE{trace}')
             return pd.DataFrame(values)
 
-    def fetch_timestamps(self, window=None, all=True, timeout=50000) -> NumpyArrayType:
+    def fetch_traces(
+        self, traces, horizontal: bool = True, window=None
+    ) -> tuple[NumpyArrayType, Union[NumpyArrayType, None]]:
+        """Fetch several traces from the same window in a single query transaction.
+
+        The trace queries are joined into one SCPI message, so that the instrument
+        returns each block back-to-back without waiting for a new command. The
+        horizontal axis is shared by all traces, and is read from the host cache
+        when possible (see :meth:`fetch_trace`).
+
+        Arguments:
+            traces: iterable of trace numbers to query
+            horizontal: If True, also return the horizontal axis
+            window: The window number to query (or None, the default, to use self.default_window)
+
+        Returns:
+            (values, axis), where values is a 2-D array shaped (len(traces), points), and axis is the horizontal axis or None
+        """
+        traces = list(traces)
+        if len(traces) == 0:
+            raise ValueError('traces must include at least one trace number')
+        if window is None:
+            window = self.default_window
+
+        if horizontal:
+            index = self._cached_horizontal(window, traces[0])
+        else:
+            index = None
+
+        msgs = [f'TRAC{window}:DATA? TRACE{t}' for t in traces]
+        values = self.query_ieee_arrays(msgs)
+
+        return values, index
+
+    def query_ieee_arrays(
+        self, msgs: list[str], dtype=None, chunk_size: Union[int, None] = None
+    ) -> NumpyArrayType:
+        """Query several IEEE-488.2 blocks of equal length in one transaction.
+
+        The messages are sent as a single semicolon-delimited command, and the
+        blocks in the reply are read directly into the rows of the returned array.
+
+        Arguments:
+            msgs: The SCPI queries to send
+            dtype: data type of the block values, or None to follow the current `format`
+            chunk_size: the number of bytes to request in each read, or None to use `self.block_chunk_size`
+        :return: a 2-D array, with one row per message
+        """
+
+        from pyvisa.constants import VI_SUCCESS_DEV_NPRESENT, VI_SUCCESS_MAX_CNT
+
+        if len(msgs) == 0:
+            raise ValueError('msgs must include at least one query')
+        if chunk_size is None:
+            chunk_size = self.block_chunk_size
+
+        msg = ';:'.join(msgs)
+        self._logger.debug(f'query {msg}')
+
+        # The read_termination seems to cause unwanted behavior in self.backend.visalib.read
+        self.backend.read_termination, old_read_term = (
+            None,
+            self.backend.read_termination,
+        )
+        self.backend.write(msg)
+
+        kws = dict(dtype=dtype, chunk_size=chunk_size)
+
+        try:
+            with self.backend.ignore_warning(
+                VI_SUCCESS_DEV_NPRESENT, VI_SUCCESS_MAX_CNT
+            ):
+                first = self._read_ieee_block(**kws)
+                values = np.empty((len(msgs), first.size), dtype=first.dtype)
+                values[0] = first
+
+                for i in range(1, len(msgs)):
+                    # the ';' separator between response message units
+                    self.backend.visalib.read(self.backend.session, 1)
+                    try:
+                        size = self._read_ieee_block(out=values[i], **kws).size
+                    except ValueError:
+                        # the block was too long, and has been discarded
+                        size = None
+
+                    if size != values.shape[1]:
+                        # drain the rest of the reply, so that it is not read as the
+                        # response to the next query
+                        for _ in range(i + 1, len(msgs)):
+                            self.backend.visalib.read(self.backend.session, 1)
+                            self._discard_bytes(self._read_ieee_header(), chunk_size)
+                        self.backend.visalib.read(
+                            self.backend.session, len(old_read_term)
+                        )
+                        raise ValueError(
+                            f'the reply to {msgs[i]!r} is not the same length as the '
+                            f'{values.shape[1]} values of the reply to {msgs[0]!r}'
+                        )
+
+                # Read termination characters so that the instrument doesn't show
+                # a "QUERY INTERRUPTED" error when there is unread buffer
+                self.backend.visalib.read(self.backend.session, len(old_read_term))
+        finally:
+            self.backend.read_termination = old_read_term
+
+        return values
+
+    def fetch_timestamps(
+        self, window=None, all=True, timeout=50000, binary=True
+    ) -> NumpyArrayType:
         """Fetch data timestamps associated with acquired data. Not all types of acquired data support timestamping,
         and not all modes support the trace argument. A choice that is incompatible with the current state
         of the signal analyzer should lead to a TimeoutError.
@@ -471,8 +1056,14 @@ class RohdeSchwarzFSWBase(lb.VISADevice):
         Arguments:
             all: If True, acquire and return all available timestamps; if False, only the most current timestamp.
             window: The window number corresponding to the desired timestamp data (or self.default_window when window=None)
+            binary: If True, transfer all timestamps as a binary block; otherwise, as ASCII text
+        :return: timestamps in seconds since the epoch (see :meth:`fetch_timestamps_ns` for full precision)
         """
 
+        if all and binary:
+            ns = self.fetch_timestamps_ns(window, timeout=timeout)
+            return ns // 1_000_000_000 + 1e-9 * (ns % 1_000_000_000)
+
         if window is None:
             window = self.default_window
 
@@ -495,12 +1086,59 @@ class RohdeSchwarzFSWBase(lb.VISADevice):
         else:
             return ret
 
+    def fetch_timestamps_ns(
+        self, window=None, new_only: bool = False, timeout=50000
+    ) -> NumpyArrayType:
+        """Fetch all spectrogram timestamps through a binary transfer, in the same
+        (newest-first) order as the spectrogram rows.
+
+        The instrument reports each timestamp as a count of seconds and nanoseconds. These
+        are transferred as 64-bit values (switching `format` temporarily, if necessary)
+        to preserve full precision.
+
+        Arguments:
+            window: The window number corresponding to the desired timestamp data (or self.default_window when window=None)
+            new_only: If True, return only timestamps that are newer than those returned by the previous call with `new_only=True`
+            timeout: The VISA timeout for the transfer (in ms)
+        :return: int64 array of nanoseconds since the epoch
+        """
+        if window is None:
+            window = self.default_window
+
+        prev_format = self._block_format
+        if prev_format != 'REAL,64':
+            self.format = 'REAL,64'
+
+        _to = self.backend.timeout
+        if timeout is not None:
+            self.backend.timeout = timeout
+        try:
+            ts = self.query_ieee_array(f'CALC{window}:SGR:TST:DATA? ALL')
+        finally:
+            self.backend.timeout = _to
+            if prev_format not in (None, 'REAL,64'):
+                self.format = prev_format
+
+        # columns are (seconds, nanoseconds, reserved, reserved)
+        ts = ts.reshape((ts.size // 4, 4))
+        ns = ts[:, 0].astype(np.int64) * 1_000_000_000 + ts[:, 1].astype(np.int64)
+
+        if new_only:
+            last = self._timestamp_marks.get(str(window), None)
+            if last is not None:
+                ns = ns[ns > last]
+            if ns.size > 0:
+                self._timestamp_marks[str(window)] = int(ns.max())
+
+        return ns
+
     def fetch_spectrogram(
         self,
         window: Union[int, None] = None,
         freqs: str = 'exact',
         timestamps: str = 'exact',
         timeout=None,
+        sink=None,
     ):
         """
         Fetch a spectrogram without initiating a new trigger. This has been tested in IQ Analyzer and real time
@@ -509,15 +1147,16 @@ class RohdeSchwarzFSWBase(lb.VISADevice):
 
         Arguments:
             freqs: 'exact' (to fetch the frequency axis), 'fast' (to guess at index values based on FFT parameters), or None (leaving the integer indices)
-            timestamps: 'exact' (to fetch the frequency axis), 'fast' (to guess at index values based on sweep time), or None (leaving the integer indices)
+            timestamps: 'exact' (to fetch the timestamps, in s), 'exact_ns' (to fetch the timestamps in int64 ns), 'fast' (to guess at index values based on sweep time), or None (leaving the integer indices)
             window: The window number corresponding to the desired timestamp data (or self.default_window when window=None)
-        :return: a pandas DataFrame containing the acquired data
+            sink: None to return a DataFrame, or an object (such as :class:`DiskSpectrogram` or a :class:`SpectrogramReducer`) that receives the rows in chronological order through `sink.append(data, frequency, timestamps)`, or a list of these
+        :return: a pandas DataFrame containing the acquired data, or `sink` if it was specified
         """
         if timeout is None:
-            if self.trigger_source.lower() == 'mask':
-                max_trigger_time = self.trigger_post_time
+            if self._mirror.get('trigger_source').lower() == 'mask':
+                max_trigger_time = self._mirror.get('trigger_post_time')
             else:
-                max_trigger_time = self.sweep_dwell_time
+                max_trigger_time = self._mirror.get('sweep_dwell_time')
 
             old_timeout, self.backend.timeout = (
                 self.backend.timeout,
@@ -527,63 +1166,88 @@ class RohdeSchwarzFSWBase(lb.VISADevice):
             old_timeout = timeout
 
         with self.suppress_timeout():
-            if window is None:
-                window = self.default_window
-
-            data = self.query_ieee_array(f'TRAC{window}:DATA? SPEC')
-
-            # Fetch time axis
-            if timestamps not in ('fast', 'exact', None):
-                raise ValueError("timestamps argument must be 'fast', 'exact', or None")
-            elif timestamps == 'exact':
-                t = self.fetch_timestamps(all=True, window=window, timeout=timeout)
-            elif timestamps is None:
-                t = None
-
-            # Fetch frequency axis
-            if freqs == 'fast':
-                fc = self.frequency_center
-                fsamp = self.iq_sample_rate
-                Nfreqs = self.sweep_points
-                f_ = fc + np.linspace(
-                    -fsamp * (1.0 - 1.0 / Nfreqs) / 2,
-                    +fsamp * (1.0 - 1.0 / Nfreqs) / 2,
-                    Nfreqs,
-                )
-            if freqs == 'exact':
-                f_ = self.fetch_horizontal(window)
-                Nfreqs = len(f_)
-            elif freqs is None:
-                f_ = None
-                Nfreqs = self.sweep_points
-
-            # Reshape data according to frequency axis, since we'll be most certain
-            # to know that dimension
-            if data.size > 1:
-                data = data.reshape((data.size // Nfreqs, Nfreqs))
-
-            # Generate timestamps if we're going to guesstimate
-            if timestamps == 'fast':
-                if window == 1:
-                    sweep_time = self.sweep_time
-                else:
-                    sweep_time = getattr(self, 'sweep_time_window' + window)
-                ts0 = self.fetch_timestamps(all=False, window=window)
-                t = (ts0 - sweep_time * data.shape[0]) + sweep_time * np.arange(
-                    data.shape[0]
-                )[::-1]
+            data, f_, t = self._fetch_spectrogram_arrays(
+                window, freqs=freqs, timestamps=timestamps, timeout=timeout
+            )
 
             self.backend.timeout = old_timeout
 
-            if data.size > 1:
-                return pd.DataFrame(
-                    data[::-1], columns=f_, index=None if t is None else t[::-1]
-                )
+            if isinstance(sink, (list, tuple)):
+                if data.ndim == 2:
+                    _SinkGroup(sink).append(data, f_, t)
+                return sink
+            elif sink is not None:
+                if data.ndim == 2:
+                    sink.append(data, f_, t)
+                return sink
+            elif data.ndim == 2:
+                return pd.DataFrame(data, columns=f_, index=t)
             else:
                 return pd.DataFrame([], columns=f_)
 
         self.backend.timeout = old_timeout
 
+    def _fetch_spectrogram_arrays(
+        self, window=None, freqs='exact', timestamps='exact', timeout=None
+    ) -> tuple:
+        """fetch spectrogram data and its axes as numpy arrays.
+
+        The data are returned as a (time x frequency) view in chronological order,
+        without copying the reversed (newest-first) ordering of the instrument.
+        Spectrograms with no data are returned as 1-D arrays.
+
+        Returns:
+            (data, frequency or None, timestamps or None)
+        """
+        if window is None:
+            window = self.default_window
+
+        data = self.query_ieee_array(f'TRAC{window}:DATA? SPEC')
+
+        # Fetch time axis
+        if timestamps not in ('fast', 'exact', 'exact_ns', None):
+            raise ValueError(
+                "timestamps argument must be 'fast', 'exact', 'exact_ns', or None"
+            )
+        elif timestamps == 'exact':
+            t = self.fetch_timestamps(all=True, window=window, timeout=timeout)
+        elif timestamps == 'exact_ns':
+            t = self.fetch_timestamps_ns(window=window, timeout=timeout)
+        elif timestamps is None:
+            t = None
+
+        # Fetch frequency axis (from the host cache, if the settings haven't changed)
+        if freqs == 'fast':
+            f_ = self._fast_frequency_axis(window)
+            Nfreqs = len(f_)
+        if freqs == 'exact':
+            f_ = self._cached_horizontal(window)
+            Nfreqs = len(f_)
+        elif freqs is None:
+            f_ = None
+            Nfreqs = self.sweep_points
+
+        if data.size <= 1:
+            return data, f_, None
+
+        # Reshape data according to frequency axis, since we'll be most certain
+        # to know that dimension
+        data = data.reshape((data.size // Nfreqs, Nfreqs))
+
+        # Generate timestamps if we're going to guesstimate
+        if timestamps == 'fast':
+            if str(window) == '1':
+                sweep_time = self._mirror.get('sweep_time')
+            else:
+                sweep_time = self._mirror.get(f'sweep_time_window{window}')
+            ts0 = self.fetch_timestamps(all=False, window=window)
+            t = (ts0 - sweep_time * data.shape[0]) + sweep_time * np.arange(
+                data.shape[0]
+            )[::-1]
+
+        # the instrument returns the newest row first
+        return data[::-1], f_, (None if t is None else t[::-1])
+
     def fetch_marker(
         self, marker: int, axis: Union[Literal['X'], Literal['Y']]
     ) -> float:
@@ -595,21 +1259,49 @@ class RohdeSchwarzFSWBase(lb.VISADevice):
         """
         return float(self.query(f'CALC:MARK{marker}:{axis}?'))
 
-    def get_marker_enables(self) -> DataFrameType:
-        markers = list(range(1, 17))
-        states = [
-            [
-                self.query(f'CALC:MARK{m}:STATE?'),
-                self.query(f'CALC:MARK{m}:FUNC:BPOW:STATE?'),
-            ]
-            for m in markers
-        ]
+    def get_marker_enables(self, cached: bool = False) -> DataFrameType:
+        """Get the enabled state of each marker and its band power measurement.
+
+        The states of all markers are queried in a single transaction.
+
+        Arguments:
+            cached: If True, reuse the result of the previous call unless the markers have since been changed through :meth:`set_marker_enable` or :meth:`set_marker_position` (or the instrument state was reset, loaded, or changed channels). Changes made from the front panel are not detected.
+        """
+        if cached and 'marker_enables' in self._host_cache:
+            return self._host_cache['marker_enables'].copy()
 
-        df = pd.DataFrame(states, columns=['Marker', 'Band'], index=markers)
+        markers = list(range(1, 17))
+        msgs = []
+        for m in markers:
+            msgs += [f'CALC:MARK{m}:STATE?', f'CALC:MARK{m}:FUNC:BPOW:STATE?']
+        states = np.array(_query_joined(self, msgs), dtype=int).reshape(-1, 2)
 
+        df = pd.DataFrame(
+            states.astype(bool), columns=['Marker', 'Band'], index=markers
+        )
         df.index.name = 'Marker'
 
-        return df.astype(int).astype(bool)
+        self._host_cache['marker_enables'] = df.copy()
+        return df
+
+    def set_marker_enable(self, marker: int, enabled: bool = True, band=None):
+        """Enable or disable a marker, and optionally its band power measurement.
+
+        Arguments:
+            marker: marker number on instrument display
+            enabled: whether to show the marker
+            band: whether to enable band power measurement at the marker, or None to leave it unchanged
+        """
+        msgs = [f'CALC:MARK{marker}:STATE {int(enabled)}']
+        if band is not None:
+            msgs.append(f'CALC:MARK{marker}:FUNC:BPOW:STATE {int(band)}')
+        self.write(';:'.join(msgs))
+
+        enables = self._host_cache.get('marker_enables', None)
+        if enables is not None:
+            enables.loc[marker, 'Marker'] = bool(enabled)
+            if band is not None:
+                enables.loc[marker, 'Band'] = bool(band)
 
     def get_marker_power(self, marker: int) -> float:
         """Get marker value (on vertical axis)
@@ -637,6 +1329,8 @@ class RohdeSchwarzFSWBase(lb.VISADevice):
             marker: marker number on instrument display
             position: position of the marker, in units of the horizontal axis
         """
+        # positioning a marker also enables it
+        self._host_cache.pop('marker_enables', None)
         return self.write(f'CALC:MARK{marker}:X {position}')
 
     def trigger_output_pulse(self, port: int):
@@ -678,25 +1372,46 @@ class _RSSpectrumAnalyzerMixIn(RohdeSchwarzFSWBase):
 
     def get_marker_power_table(self):
         """Get the values of all markers."""
-        enables = self.get_marker_enables()
-
-        values = pd.DataFrame(
-            columns=['Frequency'] + enables.columns.values.tolist(),
-            index=enables.index,
-            dtype=float,
-            copy=True,
-        )
+        return self.fetch_marker_snapshot(cached_enables=False)
 
-        for m in enables.index:
-            if enables.loc[m, 'Marker']:
-                values.loc[m, 'Marker'] = self.get_marker_power(m)
-                values.loc[m, 'Frequency'] = self.get_marker_position(m)
+    def fetch_marker_snapshot(self, cached_enables: bool = False) -> DataFrameType:
+        """Get the position, power, and band power of every enabled marker.
 
-                if enables.loc[m, 'Band']:
-                    values.loc[m, 'Band'] = self.get_marker_band_power(m)
+        The readings are queried in a single transaction (plus one more to check
+        which markers are enabled, unless `cached_enables` is True and the marker
+        configuration is known on the host).
 
-        values.dropna(how='all', inplace=True)
-        return values
+        Arguments:
+            cached_enables: If True, reuse the last known marker enable states, which skips a query but misses markers enabled by other means (see :meth:`get_marker_enables`)
+        Returns:
+            DataFrame indexed by marker number, with columns 'Frequency', 'Marker', and 'Band' (NaN where band power is disabled)
+        """
+        enables = self.get_marker_enables(cached=cached_enables)
+        enables = enables[enables['Marker']]
+        markers = enables.index.values
+        band = enables['Band'].values
+
+        msgs = []
+        for m, b in zip(markers, band):
+            msgs += [f'CALC:MARK{m}:X?', f'CALC:MARK{m}:Y?']
+            if b:
+                msgs.append(f'CALC:MARK{m}:FUNC:BPOW:RES?')
+
+        table = np.full((len(markers), 3), np.nan)
+        if len(msgs) > 0:
+            values = np.array(_query_joined(self, msgs), dtype=float)
+
+            # each marker has 2 replies, plus 1 if band power is enabled
+            offsets = np.concatenate([[0], np.cumsum(2 + band)[:-1]]).astype(int)
+            table[:, 0] = values[offsets]
+            table[:, 1] = values[offsets + 1]
+            table[band, 2] = values[offsets[band] + 2]
+
+        table = pd.DataFrame(
+            table, columns=['Frequency', 'Marker', 'Band'], index=markers
+        )
+        table.index.name = 'Marker'
+        return table
 
     def fetch_marker_bpow(self, marker: int) -> float:
         """Get marker band power measurement
@@ -721,7 +1436,12 @@ class _RSSpectrumAnalyzerMixIn(RohdeSchwarzFSWBase):
 
 
 class _RSLTEAnalyzerMixIn(RohdeSchwarzFSWBase):
-    format = attr.property.str(key='FORM', only=('REAL', 'ASCII'), case=False)
+    format = attr.property.str(
+        key='FORM', only=('REAL', 'REAL,32', 'ASCII'), case=False
+    )
+
+    # changes to these invalidate the host cache of resource grid dimensions
+    _LTE_GRID_ATTRS = ('uplink_sample_rate', 'downlink_sample_rate')
 
     @attr.property.float(min=0)
     def uplink_sample_rate(self):
@@ -734,23 +1454,84 @@ class _RSLTEAnalyzerMixIn(RohdeSchwarzFSWBase):
         return float(response[2:].replace('_', '.')) * 1e6
 
     def open(self):
-        lb.VISADevice.open(self)
         # self.verify_channel_type()
-        self.format = 'REAL'
+        lb.paramattr.observe(
+            self,
+            self._on_lte_config_change,
+            name=list(self._LTE_GRID_ATTRS),
+            type_=('set', 'get'),
+        )
+        # equivalent to 'REAL', and also accepted by the base class format attribute
+        self.format = 'REAL,32'
 
-    def fetch_power_vs_symbol_x_carrier(self, window, trace):
-        data = self.fetch_trace(window=window, trace=trace)
+    def _on_lte_config_change(self, msg):
+        if msg['type'] == 'set' or msg['new'] != msg['old']:
+            self.clear_host_cache('lte_grid')
+
+    def get_subcarrier_count(self, link: Literal['UL', 'DL'] = 'UL') -> int:
+        """Return the number of subcarriers in the resource grid of the configured bandwidth.
+
+        The result is cached on the host until the LTE configuration is changed
+        through this object (or the instrument state is reset or loaded).
+
+        Arguments:
+            link: 'UL' for uplink or 'DL' for downlink
+        """
+        link = link.upper()
+        count = self._host_cache.get('lte_grid', {}).get(link, None)
+        if count is None:
+            if link == 'UL':
+                rate = self.uplink_sample_rate
+            elif link == 'DL':
+                rate = self.downlink_sample_rate
+            else:
+                raise ValueError(f"link must be 'UL' or 'DL', not {link!r}")
+
+            # Dimensioning is based on LTE standard definitions
+            # of the resource block
+            count = 12 * int(50 * rate / 10e6)
+            self._host_cache.setdefault('lte_grid', {})[link] = count
+        return count
+
+    def fetch_resource_grid(
+        self, window, trace, link: Literal['UL', 'DL'] = 'UL'
+    ) -> NumpyArrayType:
+        """Fetch a resource grid trace, such as power vs symbol x carrier.
+
+        Arguments:
+            window: The window number to query
+            trace: The trace number to query
+            link: 'UL' or 'DL', to determine the number of subcarriers
+        :return: float32 array shaped (symbol, subcarrier), with NaN where the instrument reports no value
+        """
+        values = self.query_ieee_array(f'TRAC{window}:DATA? TRACE{trace}')
+        return self._decode_resource_grid(values, link)
+
+    def fetch_resource_grids(
+        self, windows_traces: list[tuple], link: Literal['UL', 'DL'] = 'UL'
+    ) -> NumpyArrayType:
+        """Fetch several resource grid traces of equal size in a single query transaction.
+
+        Arguments:
+            windows_traces: sequence of (window, trace) pairs to query
+            link: 'UL' or 'DL', to determine the number of subcarriers
+        :return: float32 array shaped (len(windows_traces), symbol, subcarrier)
+        """
+        msgs = [f'TRAC{w}:DATA? TRACE{t}' for w, t in windows_traces]
+        values = self.query_ieee_arrays(msgs)
+        return self._decode_resource_grid(values, link)
 
-        # Dimensioning is based on LTE standard definitions
-        # of the resource block
-        Ncarrier = int(50 * self.uplink_sample_rate / 10e6)
-        Nsubcarrier = 12 * Ncarrier
-        Nsymbol = data.size // Nsubcarrier
+    def _decode_resource_grid(self, values, link) -> NumpyArrayType:
+        """reshape trace values into (..., symbol, subcarrier) with NaN in place of missing values"""
+        Nsubcarrier = self.get_subcarrier_count(link)
+        Nsymbol = values.shape[-1] // Nsubcarrier
 
-        data[data > 1e30] = np.nan
+        values = values[..., : Nsymbol * Nsubcarrier]
+        np.copyto(values, np.nan, where=values > 1e30)
+        return values.reshape(values.shape[:-1] + (Nsymbol, Nsubcarrier))
 
-        data = data.values.reshape((Nsymbol, Nsubcarrier))
-        data = pd.DataFrame(data)
+    def fetch_power_vs_symbol_x_carrier(self, window, trace):
+        data = pd.DataFrame(self.fetch_resource_grid(window, trace))
         data.index.name = 'Symbol'
         data.columns.name = 'Subcarrier'
         return data
@@ -783,6 +1564,7 @@ class _RSLTEAnalyzerMixIn(RohdeSchwarzFSWBase):
 class _RSIQAnalyzerMixIn(RohdeSchwarzFSWBase):
     _IQ_FORMATS = ('FREQ', 'MAGN', 'MTAB', 'PEAK', 'RIM', 'VECT')
     _IQ_MODES = ('TDOMain', 'FDOMain', 'IQ')
+    _IQ_DATA_FORMATS = ('COMP', 'IQBL', 'IQP')
 
     expected_channel_type = attr.value.str('RTIM', inherit=True)
 
@@ -795,35 +1577,178 @@ class _RSIQAnalyzerMixIn(RohdeSchwarzFSWBase):
     iq_format_window2 = attr.property.str(
         key='CALC2:FORM', case=False, only=_IQ_FORMATS
     )
+    iq_data_format = attr.property.str(
+        key='TRAC:IQ:DATA:FORM',
+        only=_IQ_DATA_FORMATS,
+        case=False,
+        help='sample order of IQ memory transfers (interleaved for IQP)',
+    )
+    iq_chunk_samples: int = attr.value.int(
+        1 << 20,
+        min=1,
+        cache=True,
+        help='number of IQ samples to transfer per query in chunked record fetches',
+        label='samples',
+    )
 
-    def fetch_trace(self, horizontal=False, trace=None):
-        fmt = self.iq_format
-        if fmt == 'VECT':
-            df = RohdeSchwarzFSWBase.fetch_trace(self, horizontal=False, trace=trace)
-        else:
-            df = RohdeSchwarzFSWBase.fetch_trace(
-                self, horizontal=horizontal, trace=trace
+    def iter_iq_record(
+        self,
+        start: int = 0,
+        count: Union[int, None] = None,
+        chunk_samples: Union[int, None] = None,
+        reuse: bool = False,
+    ) -> typing.Iterator[NumpyArrayType]:
+        """Iterate through the IQ memory in windows of consecutive samples.
+
+        Each window is transferred with a separate `TRAC:IQ:DATA:MEM?` query in
+        interleaved (IQP) order, read directly into the memory of a complex64 array,
+        so that a record of any length can be processed with bounded memory. This
+        switches `iq_data_format` to 'IQP', and `format` to 'REAL,32' until the
+        iteration finishes.
+
+        Arguments:
+            start: index of the first sample to fetch
+            count: number of samples to fetch, or None to fetch through the end of the record
+            chunk_samples: the number of samples in each window, or None to use `self.iq_chunk_samples`
+            reuse: if True, fill and yield the same array in each step (copy it to keep it past the next step)
+        :return: iterator of complex64 arrays
+        """
+        if count is None:
+            count = self.iq_record_length - start
+        if chunk_samples is None:
+            chunk_samples = self.iq_chunk_samples
+
+        buf = None
+        with self._iq_memory_transfer():
+            for offset in range(start, start + count, chunk_samples):
+                size = min(chunk_samples, start + count - offset)
+                if buf is None or not reuse:
+                    buf = np.empty(size, dtype=np.complex64)
+                yield self._fetch_iq_window(offset, buf[:size])
+
+    def fetch_iq_record(
+        self,
+        out: Union[NumpyArrayType, str, os.PathLike, None] = None,
+        start: int = 0,
+        count: Union[int, None] = None,
+        chunk_samples: Union[int, None] = None,
+    ) -> NumpyArrayType:
+        """Fetch a range of the IQ memory in windows of consecutive samples (see :meth:`iter_iq_record`).
+
+        Arguments:
+            out: a complex64 array to fill, a path to an .npy file to create as a memory map, or None to allocate an array
+            start: index of the first sample to fetch
+            count: number of samples to fetch, or None to fetch through the end of the record
+            chunk_samples: the number of samples in each window, or None to use `self.iq_chunk_samples`
+        :return: complex64 array (or memory map) of IQ samples
+        """
+        if count is None:
+            count = self.iq_record_length - start
+        if chunk_samples is None:
+            chunk_samples = self.iq_chunk_samples
+
+        if out is None:
+            out = np.empty(count, dtype=np.complex64)
+        elif isinstance(out, (str, os.PathLike)):
+            out = np.lib.format.open_memmap(
+                out, mode='w+', dtype=np.complex64, shape=(count,)
+            )
+        elif out.dtype != np.complex64 or out.size != count:
+            raise ValueError(
+                f'out must be a complex64 array of {count} samples, not {out.dtype} with {out.size}'
             )
 
-        if fmt == 'RIM':
-            if hasattr(df, 'columns'):
-                df = pd.DataFrame(
-                    df.iloc[: len(df) // 2].values
-                    + 1j * df.iloc[len(df) // 2 :].values,
-                    index=df.index[: len(df) // 2],
-                    columns=df.columns,
-                )
+        if not out.flags.c_contiguous:
+            raise ValueError('out must be C-contiguous')
+
+        flat = out.reshape(-1)
+        with self._iq_memory_transfer():
+            for offset in range(0, count, chunk_samples):
+                size = min(chunk_samples, count - offset)
+                self._fetch_iq_window(start + offset, flat[offset : offset + size])
+
+        if isinstance(out, np.memmap):
+            out.flush()
+        return out
+
+    @contextlib.contextmanager
+    def _iq_memory_transfer(self):
+        """set up interleaved float32 transfers of the IQ memory until exit"""
+        prev_format = self._block_format
+        if prev_format not in ('REAL', 'REAL,32'):
+            self.format = 'REAL,32'
+        prev_data_format = self.iq_data_format
+        if prev_data_format.upper() != 'IQP':
+            self.iq_data_format = 'IQP'
+        try:
+            yield
+        finally:
+            if prev_data_format.upper() != 'IQP':
+                self.iq_data_format = prev_data_format
+            if prev_format not in (None, 'REAL', 'REAL,32'):
+                self.format = prev_format
+
+    def _fetch_iq_window(self, offset: int, out: NumpyArrayType) -> NumpyArrayType:
+        # complex64 is interleaved float32 pairs, matching the IQP layout
+        self.query_ieee_array(
+            f'TRAC:IQ:DATA:MEM? {offset},{out.size}', out=out.view(np.float32)
+        )
+        return out
+
+    def fetch_trace(self, horizontal=False, trace=None, as_pandas: bool = True):
+        """Fetch the current trace data of the IQ analyzer.
+
+        In 'RIM' and 'VECT' formats, the trace is returned as complex64 IQ samples.
+        With `as_pandas=False`, the result is a numpy array: 'VECT' traces are
+        transferred as interleaved (I, Q) pairs, and are returned as a view of the
+        received float32 data without copying. 'RIM' traces hold all I values followed
+        by all Q values, which are joined with one copy (see :meth:`fetch_iq_record` for
+        interleaved transfers from the IQ memory).
+
+        Arguments:
+            horizontal: If True, index the result by the horizontal axis (requires `as_pandas=True`)
+            trace: The trace number to query (or None, the default, to use self.default_trace)
+            as_pandas: If True, return a pandas DataFrame; otherwise, a numpy array
+        """
+        fmt = self.iq_format.upper()
+
+        if not as_pandas:
+            if horizontal:
+                raise ValueError('horizontal=True requires as_pandas=True')
+            if trace is None:
+                trace = self.default_trace
+            values = self.query_ieee_array(
+                f'TRAC{self.default_window}:DATA? TRACE{trace}'
+            )
+            if fmt == 'VECT':
+                return values.view(np.complex64)
+            elif fmt == 'RIM':
+                return self._join_rim(values)
             else:
-                df = pd.Series(
-                    df.iloc[: len(df) // 2].values
-                    + 1j * df.iloc[len(df) // 2 :].values,
-                    index=df.index[: len(df) // 2],
-                )
+                return values
+
         if fmt == 'VECT':
-            df = pd.DataFrame(df.iloc[1::2].values, index=df.iloc[::2].values)
+            df = RohdeSchwarzFSWBase.fetch_trace(self, horizontal=False, trace=trace)
+            values = df.values[:, 0]
+            return pd.DataFrame(values[1::2], index=values[::2])
+
+        df = RohdeSchwarzFSWBase.fetch_trace(self, horizontal=horizontal, trace=trace)
+
+        if fmt == 'RIM':
+            iq = self._join_rim(df.values[:, 0])
+            df = pd.DataFrame(iq, index=df.index[: iq.size], columns=df.columns)
 
         return df
 
+    @staticmethod
+    def _join_rim(values: NumpyArrayType) -> NumpyArrayType:
+        """join a 'RIM' trace (all I values, followed by all Q values) into complex64"""
+        size = values.size // 2
+        iq = np.empty(size, dtype=np.complex64)
+        iq.real = values[:size]
+        iq.imag = values[size:]
+        return iq
+
     def store_trace(self, path):
         self.write(f"MMEM:STOR:IQ:STAT 1, '{path}'")
 
@@ -1004,13 +1929,13 @@ class _RSRealTimeMixIn(RohdeSchwarzFSWBase):
 
         # Work around an apparent SCPI bug by setting
         # frequency parameters in spectrum analyzer mode
-        with self.overlap_and_block(timeout=10000):
+        with self.overlap_and_block(timeout=10):
             self.apply_channel_type('SAN')
         self.channel_preset()
         self.wait()
         self.frequency_center = center_frequency
         self.wait()
-        with self.overlap_and_block(timeout=10000):
+        with self.overlap_and_block(timeout=10):
             self.apply_channel_type('RTIM')
         self.wait()
         self.initiate_continuous = False
@@ -1059,7 +1984,7 @@ class _RSRealTimeMixIn(RohdeSchwarzFSWBase):
         if analysis_window is not None:
             self.sweep_window_type = 'BLAC'
 
-        with self.overlap_and_block(timeout=2500):
+        with self.overlap_and_block(timeout=2.5):
             self.save_cache()
         lb.sleep(0.05)
 
@@ -1067,70 +1992,227 @@ class _RSRealTimeMixIn(RohdeSchwarzFSWBase):
             self.spectrogram_depth
 
     def acquire_spectrogram_sequence(
-        self, loop_time=None, delay_time=0.1, timestamps='fast'
+        self,
+        loop_time=None,
+        delay_time=0.1,
+        timestamps='fast',
+        sink=None,
     ):
         """Trigger and fetch data, optionally in a loop that continues for a specified
         duration.
 
+        By default, the spectrogram from each trigger is kept in memory until the loop
+        is finished. For long loops, pass `sink` to stream each block elsewhere instead
+        (for example, a directory path to append to a :class:`DiskSpectrogram`).
+
+        The returned timing table lists the time spent in each iteration acquiring data
+        ('active'), transferring it ('transfer'), and everything else ('idle'). The
+        duty cycle is the fraction of the acquisition time that was active.
+
         Arguments:
             loop_time: time (in s) to spend looping repeated trigger-fetch cycles, or None to execute once
             delay_time: delay time before starting (in s)
-            timestamps: 'fast' (with potential for rounding errors to ~ 10 ns) or 'exact' (slow and not recommended)
-        :return: dictionary structured as {'spectrogram': pd.DataFrame, 'spectrogram_acquisition_time': float, 'spectrogram_active_time': float}
+            timestamps: 'fast' (with potential for rounding errors to ~ 10 ns), 'exact' (fetched in s), or 'exact_ns' (fetched in int64 ns)
+            sink: None to return a concatenated DataFrame, a directory path for a new :class:`DiskSpectrogram`, an object with `append(data, frequency, timestamps)` (such as a :class:`SpectrogramReducer` or an :class:`ArrowSpectrogram`, which also records `get_state_summary()` in a new segment), or a list of these objects
+        :return: dictionary structured as {'spectrogram_data': pd.DataFrame (or the sink), 'spectrogram_acquisition_time': float, 'spectrogram_active_time': float, 'spectrogram_duty_cycle': float, 'spectrogram_timing': pd.DataFrame}
         """
-        specs = []
+        if isinstance(sink, (str, os.PathLike)):
+            sink = DiskSpectrogram(sink, mode='w')
+            owns_sink = True
+        else:
+            owns_sink = False
 
-        if self.trigger_source.lower() == 'mask':
-            max_trigger_time = self.trigger_post_time
+        if isinstance(sink, (list, tuple)):
+            sinks = sink
+            sink = _SinkGroup(sinks)
         else:
-            max_trigger_time = self.sweep_dwell_time
-        t0 = time.time()
-        time_remaining = loop_time
-        active_time = 0
+            sinks = None
 
-        while loop_time is None or time_remaining > 0:
-            # Setup
-            self.clear_spectrogram()
-            self.wait()
-            # Give the power sensor time to arm
-            lb.sleep(delay_time)
+        try:
+            # sinks that store instrument state per segment (such as ArrowSpectrogram)
+            segmented = [s for s in (sinks or [sink]) if hasattr(s, 'new_segment')]
+            if len(segmented) > 0:
+                state = self.get_state_summary()
+                for s in segmented:
+                    s.new_segment(state)
+
+            def package(data, f_, t):
+                if data.ndim != 2:
+                    return None
+                elif sink is not None:
+                    sink.append(data, f_, t)
+                    return None
+                else:
+                    return pd.DataFrame(data, columns=f_, index=t)
 
-            t0_active = time.time()
-            # Try to trigger; block until timeout.
-            with self.suppress_timeout():
-                # print(max(30*max_trigger_time,time_remaining or 0.1))
-                with self.overlap_and_block(timeout=int(1e3 * 30 * max_trigger_time)):
-                    self.trigger_single(wait=False)
-                lb.sleep(0.05)
-                active_time += time.time() - t0_active
-
-                self.backend.timeout = 6 * 1e3 * max_trigger_time
-                single = self.fetch_spectrogram(
-                    timeout=self.backend.timeout, timestamps=timestamps
-                )
-                self.backend.timeout = 1000
-                if single is not None:
-                    specs.append(single)
+            if self._mirror.get('trigger_source').lower() == 'mask':
+                max_trigger_time = self._mirror.get('trigger_post_time')
+            else:
+                max_trigger_time = self._mirror.get('sweep_dwell_time')
+            t0 = time.time()
+            time_remaining = loop_time
+            results = []
+            timing = []
+
+            while loop_time is None or time_remaining > 0:
+                t0_iteration = time.perf_counter()
+                active = transfer = 0
+
+                # Setup
+                self.clear_spectrogram()
                 self.wait()
-            self.abort()
+                # Give the power sensor time to arm
+                lb.sleep(delay_time)
+
+                # Try to trigger; block until timeout.
+                with self.suppress_timeout():
+                    t0_active = time.perf_counter()
+                    with self.overlap_and_block(timeout=30 * max_trigger_time):
+                        self.trigger_single(wait=False)
+                    active = time.perf_counter() - t0_active
+                    lb.sleep(0.05)
+
+                    self.backend.timeout = 6 * 1e3 * max_trigger_time
+                    t0_transfer = time.perf_counter()
+                    arrays = self._fetch_spectrogram_arrays(
+                        timestamps=timestamps, timeout=self.backend.timeout
+                    )
+                    transfer = time.perf_counter() - t0_transfer
+                    self.backend.timeout = 1000
+
+                    results.append(package(*arrays))
+                    self.wait()
+                self.abort()
+
+                elapsed = time.perf_counter() - t0_iteration
+                timing.append(
+                    {
+                        'active': active,
+                        'transfer': transfer,
+                        'idle': elapsed - active - transfer,
+                    }
+                )
 
-            if loop_time is None:
-                break
-            else:
-                time_remaining = loop_time - (time.time() - t0)
+                if loop_time is None:
+                    break
+                else:
+                    time_remaining = loop_time - (time.time() - t0)
+        except BaseException:
+            # release the files of a spectrogram that was opened here
+            if owns_sink:
+                sink.close()
+            raise
+
+        specs = [df for df in results if df is not None]
 
-        if len(specs) > 0:
-            specs = pd.concat(specs, axis=0) if specs else pd.DataFrame().iloc[:, :-1]
+        if owns_sink and len(sink) == 0:
+            # nothing was written, so there is no spectrogram to open for reading
+            sink.close()
+            specs = pd.DataFrame()
+            self._logger.warning('no data acquired')
+        elif owns_sink:
+            # hand back a read-only handle to the data on disk
+            sink.close()
+            specs = DiskSpectrogram(sink.path)
+        elif sink is not None:
+            if hasattr(sink, 'flush'):
+                sink.flush()
+            specs = sink if sinks is None else sinks
+        elif len(specs) > 0:
+            specs = pd.concat(specs, axis=0)
         else:
             specs = pd.DataFrame()
             self._logger.warning('no data acquired')
 
+        timing = pd.DataFrame(timing, columns=['active', 'transfer', 'idle'])
+        timing.index.name = 'Iteration'
+        acquisition_time = time.time() - t0
+
         return {
             'spectrogram_data': specs,
-            'spectrogram_acquisition_time': time.time() - t0,
-            'spectrogram_active_time': active_time,
+            'spectrogram_acquisition_time': acquisition_time,
+            'spectrogram_active_time': timing['active'].sum(),
+            'spectrogram_duty_cycle': timing['active'].sum() / acquisition_time,
+            'spectrogram_timing': timing,
         }
 
+    def record_mask_events(
+        self,
+        recorder: MaskEventRecorder,
+        duration: Union[float, None] = None,
+        max_events: Union[int, None] = None,
+        arm_timeout: float = 10,
+        timestamps: str = 'exact_ns',
+    ) -> MaskEventRecorder:
+        """Repeatedly arm the frequency mask trigger, and pass the spectrogram of each
+        event to `recorder`.
+
+        The frequency mask should be defined first (see :meth:`set_frequency_mask`), and
+        `trigger_post_time` set to the duration to capture after each trigger. The
+        recorder keeps only a bounded amount of data in memory, so this can run for
+        days; interrupt it (for example, with KeyboardInterrupt) or set `duration` or
+        `max_events` to stop.
+
+        Arguments:
+            recorder: the event recorder (which may be reused to continue a previous recording)
+            duration: time (in s) to keep recording, or None to record until interrupted
+            max_events: number of events to record before returning, or None for no limit
+            arm_timeout: time (in s) to wait for each trigger before re-arming
+            timestamps: the timestamp format passed to the recorder (see :meth:`fetch_spectrogram`)
+        :return: `recorder`
+        """
+        from pyvisa.errors import VisaIOError
+
+        if self._mirror.get('trigger_source').upper() != 'MASK':
+            self.trigger_source = 'MASK'
+
+        transfer_timeout = 6 * 1e3 * self._mirror.get('trigger_post_time') + 1000
+        t0 = time.perf_counter()
+        count = len(recorder) + (max_events or 0)
+        recorder.start()
+
+        try:
+            while duration is None or time.perf_counter() - t0 < duration:
+                if max_events is not None and len(recorder) >= count:
+                    break
+
+                self.clear_spectrogram()
+
+                triggered = False
+                t0_armed = time.perf_counter()
+                with self.suppress_timeout():
+                    with self.overlap_and_block(timeout=arm_timeout):
+                        self.trigger_single(wait=False)
+                    triggered = True
+                recorder.add_armed_time(time.perf_counter() - t0_armed)
+
+                if not triggered:
+                    # no event before the timeout
+                    self.abort()
+                    continue
+
+                _to = self.backend.timeout
+                self.backend.timeout = transfer_timeout
+                try:
+                    data, f_, t = self._fetch_spectrogram_arrays(
+                        timestamps=timestamps, timeout=transfer_timeout
+                    )
+                except VisaIOError as ex:
+                    self._logger.warning(f'dropped an event: {ex}')
+                    recorder.drop()
+                    continue
+                finally:
+                    self.backend.timeout = _to
+
+                if data.ndim != 2 or data.shape[0] == 0:
+                    recorder.drop()
+                else:
+                    recorder.add(data, f_, t)
+        finally:
+            self.abort()
+
+        return recorder
+
     def arm_spectrogram(self):
         self.clear_spectrogram()
         self.wait()
@@ -1143,14 +2225,14 @@ class _RSRealTimeMixIn(RohdeSchwarzFSWBase):
         """
         t0 = time.time()
 
-        if self.trigger_source.lower() == 'mask':
-            max_trigger_time = self.trigger_post_time
+        if self._mirror.get('trigger_source').lower() == 'mask':
+            max_trigger_time = self._mirror.get('trigger_post_time')
         else:
-            max_trigger_time = self.sweep_dwell_time
+            max_trigger_time = self._mirror.get('sweep_dwell_time')
 
         # Try to trigger; block until timeout.
         # print(max(30*max_trigger_time,time_remaining or 0.1))
-        with self.overlap_and_block(timeout=int(1e3 * 30 * max_trigger_time)):
+        with self.overlap_and_block(timeout=30 * max_trigger_time):
             self.trigger_single(wait=False)
 
         return {'spectrogram_active_time': time.time() - t0}
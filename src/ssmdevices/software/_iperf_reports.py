@@ -0,0 +1,437 @@
+"""Incremental parsing of iperf report output into columnar tables"""
+
+import calendar
+import collections
+import json
+import threading
+import time
+import labbench as lb
+import typing
+from typing import Callable, Union
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+    import numpy as np
+else:
+    # delayed import for speed
+    pd = lb.util.lazy_import('pandas')
+    np = lb.util.lazy_import('numpy')
+
+__all__ = ['IPerf2ReportParser', 'IPerf3ReportDecoder']
+
+
+class _ColumnBuffer:
+    """typed columns that hold rows until they are taken, growing by doubling"""
+
+    def __init__(self, columns: tuple[tuple[str, str], ...], capacity: int = 1024):
+        self.columns = columns
+        self.capacity = capacity
+        self._allocate()
+
+    def __len__(self):
+        return self.count
+
+    def append(self, row: dict):
+        if self.count == self._size:
+            self._size *= 2
+            for name in self.data:
+                self.data[name] = np.resize(self.data[name], self._size)
+
+        i = self.count
+        for name, value in row.items():
+            self.data[name][i] = value
+        self.count += 1
+
+    def take(self) -> dict[str, 'np.ndarray']:
+        """return the filled part of each column, and start new columns"""
+        data = {name: values[: self.count] for name, values in self.data.items()}
+        self._allocate()
+        return data
+
+    def _allocate(self):
+        self.count = 0
+        self._size = self.capacity
+        self.data = {name: np.empty(self._size, dtype=dtype) for name, dtype in self.columns}
+
+
+class IPerf2ReportParser:
+    """Parse iperf2 CSV reports (`-y C`) one line at a time into preallocated columns.
+
+    Only the rows that have not yet been consumed by `read` are kept in memory,
+    in column arrays that grow by doubling from `capacity` rows. Lines that are not
+    CSV reports (such as status messages) are logged and kept in `messages`, up to
+    the most recent 100.
+
+    The `put` method has the signature of `queue.Queue.put`, so that the parser can take
+    the place of the stdout queue of a background :class:`labbench.ShellBackend` run,
+    and parse each line on the thread that reads it.
+
+    With `udp=True`, client reports (which carry no datagram statistics) are kept
+    with NaN in the UDP columns, as are any other reports with only the common fields.
+
+    Timestamps are reported by iperf with 1 s resolution. As in earlier releases, the
+    fractional part is inferred from the row number and the report `interval`.
+
+    Arguments:
+        udp: whether the reports include UDP datagram statistics
+        interval: the report interval (in s), or None if reports are not periodic
+        capacity: the initial number of rows to allocate
+        callback: None, or callable `callback(row: dict)` that is called on each parsed report (on the reading thread)
+        logger: the logger for messages, or None to use the labbench logger
+    """
+
+    _COLUMNS = (
+        ('timestamp', 'datetime64[ns]'),
+        ('source_address', 'object'),
+        ('source_port', 'int32'),
+        ('destination_address', 'object'),
+        ('destination_port', 'int32'),
+        ('bits_per_second', 'float64'),
+    )
+
+    # float, so that UDP client reports (which omit these fields) can hold NaN
+    _UDP_COLUMNS = (
+        ('jitter_milliseconds', 'float64'),
+        ('datagrams_lost', 'float64'),
+        ('datagrams_sent', 'float64'),
+        ('datagrams_loss_percentage', 'float64'),
+        ('datagrams_out_of_order', 'float64'),
+    )
+
+    _CONVERTERS = {'object': str, 'int32': int, 'int64': int, 'float64': float}
+
+    # the CSV fields that are not kept in the table: test_id, interval, transferred_bytes
+    _SKIP_FIELDS = (5, 6, 7)
+
+    def __init__(
+        self,
+        udp: bool = False,
+        interval: Union[float, None] = None,
+        capacity: int = 1024,
+        callback: Union[Callable[[dict], None], None] = None,
+        logger=None,
+    ):
+        self.udp = udp
+        self.interval = interval
+        self.capacity = capacity
+        self.callback = callback
+        self._logger = lb.logger if logger is None else logger
+
+        self.columns = self._COLUMNS + (self._UDP_COLUMNS if udp else ())
+        # UDP client interval reports have only the common fields
+        self._field_counts = (9, 9 + len(self._UDP_COLUMNS)) if udp else (9,)
+
+        self.messages = collections.deque(maxlen=100)
+        self.last_row = None
+
+        # rows parsed since the start, which determine fractional timestamps
+        self.rows_parsed = 0
+        self.lines = 0
+
+        self._lock = threading.Condition()
+        self._last_stamp = (None, None)
+        self._rows = _ColumnBuffer(self.columns, capacity)
+
+    def __len__(self):
+        """the number of unconsumed rows"""
+        return len(self._rows)
+
+    def __repr__(self):
+        return f'{type(self).__name__}(udp={self.udp}, pending={len(self)})'
+
+    def put(self, line: str, block: bool = True, timeout: Union[float, None] = None):
+        """parse one line of output"""
+        self.feed(line)
+
+    def feed(self, text: Union[str, bytes]):
+        """Parse one or more complete lines of output.
+
+        Arguments:
+            text: a line, or several lines separated by newlines
+        """
+        if isinstance(text, bytes):
+            text = text.decode(errors='replace')
+
+        for line in text.splitlines():
+            line = line.strip()
+            if len(line) > 0:
+                self._parse_line(line)
+
+    def wait(self, lines: int = 1, timeout: Union[float, None] = None) -> bool:
+        """Block until at least `lines` lines of output (reports or messages) have arrived.
+
+        Returns:
+            True if the lines arrived, or False on timeout
+        """
+        with self._lock:
+            return self._lock.wait_for(lambda: self.lines >= lines, timeout)
+
+    def read(self) -> 'pd.DataFrame':
+        """Return the unconsumed rows as a DataFrame, and release them."""
+        with self._lock:
+            data = self._rows.take()
+        return pd.DataFrame(data)
+
+    def stats(self) -> dict:
+        return {
+            'lines': self.lines,
+            'rows_parsed': self.rows_parsed,
+            'pending': len(self),
+            'messages': len(self.messages),
+            'bits_per_second': None if self.last_row is None else self.last_row['bits_per_second'],
+        }
+
+    def _parse_timestamp(self, text: str) -> int:
+        """return the report time in ns, with fractional seconds inferred from the row number"""
+        if text == self._last_stamp[0]:
+            seconds = self._last_stamp[1]
+        else:
+            # iperf writes local time without a zone, which is kept naive as in pandas
+            seconds = calendar.timegm(time.strptime(text[:14], '%Y%m%d%H%M%S'))
+            self._last_stamp = text, seconds
+
+        ns = seconds * 1_000_000_000
+        if self.interval is not None:
+            frac = (self.rows_parsed * self.interval) % 1
+            ns += int(round(frac * 1e9))
+        return ns
+
+    def _parse_line(self, line: str):
+        fields = line.split(',')
+        if len(fields) not in self._field_counts:
+            self._message(line)
+            return
+
+        values = [f for i, f in enumerate(fields[1:], 1) if i not in self._SKIP_FIELDS]
+        try:
+            row = {'timestamp': np.datetime64(self._parse_timestamp(fields[0]), 'ns')}
+            for (name, dtype), value in zip(self.columns[1:], values):
+                row[name] = self._CONVERTERS[dtype](value)
+            for name, _ in self.columns[len(row) :]:
+                row[name] = np.nan
+        except ValueError:
+            self._message(line)
+            return
+
+        with self._lock:
+            self._rows.append(row)
+            self.rows_parsed += 1
+            self.lines += 1
+            self._lock.notify_all()
+
+        self.last_row = row
+        if self.callback is not None:
+            self.callback(row)
+
+    def _message(self, line: str):
+        self._logger.warning(f'stdout: {line!r}')
+        with self._lock:
+            self.messages.append(line)
+            self.lines += 1
+            self._lock.notify_all()
+
+
+class IPerf3ReportDecoder:
+    """Decode iperf3 JSON output (`-J`) or line-delimited JSON events (`--json-stream`)
+    into a table with a row for each stream in each report interval.
+
+    With `--json-stream`, each interval is decoded as its line arrives, so that long
+    background runs can be monitored as they run. iperf3 writes a `-J` document only
+    when the test ends, so it is decoded all at once. As with
+    :class:`IPerf2ReportParser`, only the rows that have not been consumed by `read`
+    are kept in memory, and `put` allows the decoder to take the place of the stdout
+    queue of a background run.
+
+    The columns are 'timestamp' (the interval start time), 'interval' (the interval
+    number), 'socket', 'start' and 'end' (in s from the test start), 'bytes',
+    'bits_per_second', 'retransmits', 'snd_cwnd' (in bytes), 'rtt' and 'rttvar' (in us),
+    'jitter_ms', 'lost_packets', 'packets', 'lost_percent', 'omitted', and 'sender'.
+    Values that iperf3 does not report for the protocol (for example, TCP statistics
+    in UDP tests) are NaN.
+
+    Arguments:
+        capacity: the initial number of rows to allocate
+        callback: None, or callable `callback(rows: list[dict])` that is called with the rows of each interval (on the reading thread)
+        logger: the logger for messages, or None to use the labbench logger
+    """
+
+    _COLUMNS = (
+        ('timestamp', 'datetime64[ns]'),
+        ('interval', 'int64'),
+        ('socket', 'int32'),
+        ('start', 'float64'),
+        ('end', 'float64'),
+        ('bytes', 'int64'),
+        ('bits_per_second', 'float64'),
+        ('retransmits', 'float64'),
+        ('snd_cwnd', 'float64'),
+        ('rtt', 'float64'),
+        ('rttvar', 'float64'),
+        ('jitter_ms', 'float64'),
+        ('lost_packets', 'float64'),
+        ('packets', 'float64'),
+        ('lost_percent', 'float64'),
+        ('omitted', 'bool'),
+        ('sender', 'bool'),
+    )
+
+    def __init__(
+        self,
+        capacity: int = 1024,
+        callback: Union[Callable[[list], None], None] = None,
+        logger=None,
+    ):
+        self.callback = callback
+        self._logger = lb.logger if logger is None else logger
+
+        self.start_info = None
+        self.summary = None
+        self.error = None
+        self.intervals = 0
+        self.lines = 0
+
+        self._lock = threading.Condition()
+        self._rows = _ColumnBuffer(self._COLUMNS, capacity)
+        self._document = []
+        self._t0_ns = None
+
+    def __len__(self):
+        """the number of unconsumed rows"""
+        return len(self._rows)
+
+    def __repr__(self):
+        return f'{type(self).__name__}(intervals={self.intervals}, pending={len(self)})'
+
+    def put(self, line: str, block: bool = True, timeout: Union[float, None] = None):
+        """decode one line of output"""
+        self.feed(line)
+
+    def feed(self, text: Union[str, bytes]):
+        """Decode one or more complete lines of output.
+
+        Arguments:
+            text: a line, or several lines separated by newlines
+        """
+        if isinstance(text, bytes):
+            text = text.decode(errors='replace')
+
+        for line in text.splitlines():
+            self._feed_line(line)
+
+    @property
+    def finished(self) -> bool:
+        """whether the end of the test has been decoded"""
+        return self.summary is not None or self.error is not None
+
+    def wait(self, lines: int = 1, timeout: Union[float, None] = None) -> bool:
+        """Block until at least `lines` lines of output have arrived.
+
+        Returns:
+            True if the lines arrived, or False on timeout
+        """
+        with self._lock:
+            return self._lock.wait_for(lambda: self.lines >= lines, timeout)
+
+    def read(self) -> 'pd.DataFrame':
+        """Return the unconsumed rows as a DataFrame, and release them."""
+        with self._lock:
+            data = self._rows.take()
+        return pd.DataFrame(data)
+
+    def stats(self) -> dict:
+        return {
+            'lines': self.lines,
+            'intervals': self.intervals,
+            'pending': len(self),
+            'finished': self.finished,
+        }
+
+    def _feed_line(self, line: str):
+        with self._lock:
+            self.lines += 1
+            self._lock.notify_all()
+
+        stripped = line.strip()
+        if len(stripped) == 0:
+            return
+
+        if len(self._document) == 0 and stripped.startswith('{') and stripped.endswith('}'):
+            # one event of a --json-stream
+            try:
+                event = json.loads(stripped)
+            except ValueError:
+                pass
+            else:
+                self._handle_event(event.get('event', None), event.get('data', {}))
+                return
+
+        # part of a -J document, which ends with a closing brace at the first column
+        self._document.append(line)
+        if line.rstrip() == '}':
+            text = '\n'.join(self._document)
+            self._document = []
+            try:
+                doc = json.loads(text)
+            except ValueError:
+                self._logger.warning(f'could not decode iperf3 JSON output: {text[:200]!r}')
+                return
+
+            self._handle_event('start', doc.get('start', {}))
+            for interval in doc.get('intervals', []):
+                self._handle_event('interval', interval)
+            if 'error' in doc:
+                self._handle_event('error', doc['error'])
+            self._handle_event('end', doc.get('end', {}))
+
+    def _handle_event(self, kind: str, data):
+        if kind == 'start':
+            self.start_info = data
+            timesecs = data.get('timestamp', {}).get('timesecs', None)
+            if timesecs is not None:
+                self._t0_ns = int(timesecs) * 1_000_000_000
+        elif kind == 'interval':
+            self._add_interval(data)
+        elif kind == 'end':
+            self.summary = data
+        elif kind == 'error':
+            self.error = data
+            self._logger.warning(f'iperf3 error: {data}')
+
+    def _add_interval(self, data: dict):
+        rows = []
+        for stream in data.get('streams', []):
+            start = stream.get('start', np.nan)
+            if self._t0_ns is None:
+                timestamp = np.datetime64('NaT')
+            else:
+                timestamp = np.datetime64(self._t0_ns + int(round(start * 1e9)), 'ns')
+
+            rows.append(
+                {
+                    'timestamp': timestamp,
+                    'interval': self.intervals,
+                    'socket': stream.get('socket', -1),
+                    'start': start,
+                    'end': stream.get('end', np.nan),
+                    'bytes': stream.get('bytes', 0),
+                    'bits_per_second': stream.get('bits_per_second', np.nan),
+                    'retransmits': stream.get('retransmits', np.nan),
+                    'snd_cwnd': stream.get('snd_cwnd', np.nan),
+                    'rtt': stream.get('rtt', np.nan),
+                    'rttvar': stream.get('rttvar', np.nan),
+                    'jitter_ms': stream.get('jitter_ms', np.nan),
+                    'lost_packets': stream.get('lost_packets', np.nan),
+                    'packets': stream.get('packets', np.nan),
+                    'lost_percent': stream.get('lost_percent', np.nan),
+                    'omitted': stream.get('omitted', False),
+                    'sender': stream.get('sender', True),
+                }
+            )
+
+        with self._lock:
+            for row in rows:
+                self._rows.append(row)
+            self.intervals += 1
+
+        if self.callback is not None:
+            self.callback(rows)
@@ -1,6 +1,7 @@
 import psutil
 import socket
 import re
+import threading
 
 INTERFACE_FIELDS = ('interface', 'ip_address', 'physical_address', 'ipv6_address')
 
@@ -70,14 +71,59 @@ def network_interface_info(resource):
     return addrs[resource]
 
 
-def get_ipv4_occupied_ports(ip):
+def get_ipv4_occupied_ports(ip=None):
+    """return the set of local IPv4 ports in use at address `ip`, or at any address if `ip` is None"""
     return {
         conn.laddr[1]
         for conn in psutil.net_connections(kind='inet4')
-        if ip in conn.laddr
+        if ip is None or ip in conn.laddr
     }
 
 
+class PortAllocator:
+    """Assign distinct network ports to several processes, based on a single
+    snapshot of the ports that were already in use.
+
+    Allocation is thread-safe. Ports are handed out in increasing order from the
+    requested port, wrapping around to `min_port` after `max_port`.
+
+    :param occupied: ports to avoid, such as the result of `get_ipv4_occupied_ports()`
+    :param min_port: the lowest port to allocate
+    :param max_port: the highest port to allocate
+    """
+
+    def __init__(self, occupied=(), min_port=1024, max_port=65535):
+        self.occupied = set(occupied)
+        self.min_port = min_port
+        self.max_port = max_port
+        self.allocated = set()
+        self._next = min_port
+        self._lock = threading.Lock()
+
+    def allocate(self, port=None):
+        """return `port` if it is free, otherwise the next free port after it (or after the last allocation if `port` is None)"""
+        with self._lock:
+            if port is None:
+                port = self._next
+            port = min(max(port, self.min_port), self.max_port)
+
+            for i in range(self.max_port - self.min_port + 1):
+                if port not in self.occupied and port not in self.allocated:
+                    self.allocated.add(port)
+                    self._next = port + 1 if port < self.max_port else self.min_port
+                    return port
+                port = port + 1 if port < self.max_port else self.min_port
+
+        raise ConnectionError(
+            f'no free ports between {self.min_port} and {self.max_port}'
+        )
+
+    def release(self, port):
+        """return an allocated port to the pool"""
+        with self._lock:
+            self.allocated.discard(port)
+
+
 def get_ipv4_address(resource):
     """Try to look up the IP address of a network interface by its name
     or MAC (physical) address.
@@ -8,7 +8,10 @@ __all__ = [
     'LocalIPerf3',
     'AdbIPerf2',
     'LocalIPerf2Pair',
+    'LocalIPerf2PairGroup',
     'LocalPythonTrafficProfiler_ClosedLoopTCP',
+    'IPerf2ReportParser',
+    'IPerf3ReportDecoder',
 ]
 
 import datetime
@@ -17,18 +20,19 @@ import socket
 import subprocess as sp
 import time
 import traceback
-from io import StringIO
 from pathlib import Path
 from queue import Empty, Queue
-from threading import Event, Thread
+from threading import Barrier, Event, Thread
 from time import perf_counter
 from contextlib import AbstractContextManager, suppress
 
 try:
     from ._networking import find_free_port
+    from ._iperf_reports import IPerf2ReportParser, IPerf3ReportDecoder
 except ImportError as ex:
     if 'relative import' in str(ex):
         from _networking import find_free_port
+        from _iperf_reports import IPerf2ReportParser, IPerf3ReportDecoder
 
 import labbench as lb
 from labbench import paramattr as attr
@@ -49,12 +53,14 @@ SeriesType: typing.TypeAlias = 'pd.Series'
 
 if __name__ == '__main__':
     from _networking import (
+        PortAllocator,
         get_ipv4_address,
         get_ipv4_occupied_ports,
         list_network_interfaces,
     )
 else:
     from ._networking import (
+        PortAllocator,
         get_ipv4_address,
         get_ipv4_occupied_ports,
         list_network_interfaces,
@@ -197,6 +203,11 @@ class IPerf3Values(IPerf2Values):
         key='-J',
         help='output data in JSON format',
     )
+    json_stream: bool = attr.value.bool(
+        default=False,
+        key='--json-stream',
+        help='output data as a JSON event on each line, as it is measured (iperf 3.17 or newer)',
+    )
     zerocopy: bool = attr.value.bool(
         default=False,
         key='-Z',
@@ -246,7 +257,7 @@ class ShellIPerfBase(lb.ShellBackend):
 class LocalIPerfBase(ShellIPerfBase):
     def profile(self, block: bool = True):
         self.check_ports()
-        super().profile(self.binary_path, block=block)
+        return super().profile(self.binary_path, block=block)
 
     def check_ports(self):
         """check the availability of specified ports on the host"""
@@ -288,12 +299,115 @@ class LocalIPerf3(LocalIPerfBase, IPerf3Values):
     json: bool = attr.value.bool(
         default=False, key='-J', help='output data in JSON format'
     )
+    json_stream: bool = attr.value.bool(
+        default=False,
+        key='--json-stream',
+        help='output data as a JSON event on each line, as it is measured (iperf 3.17 or newer)',
+    )
     zerocopy: bool = attr.value.bool(
         default=False, key='-Z', help='avoid buffer copies while sending data'
     )
 
+    def profile(self, block=True, callback=None):
+        """run iperf3.
+
+        With `json` or `json_stream`, the output is decoded into a DataFrame with a row
+        for each stream in each report interval (see :class:`IPerf3ReportDecoder`).
+        Background runs with `json_stream` are decoded as each interval arrives; the
+        `json` document is only written by iperf3 when the run ends. The decoder of
+        the last run is kept as :attr:`decoder`, for its `start_info` and `summary`.
+
+        Arguments:
+            block: if True, wait for iperf3 to finish and return its output; otherwise, run it in the background
+            callback: None, or (for background runs with JSON output) a callable `callback(rows: list[dict])` that receives the rows of each interval as it is decoded
+
+        Returns:
+            the output (if block is True), as a DataFrame with JSON output, otherwise text
+
+        Raises:
+            ChildProcessError: if iperf3 reports an error in the JSON output of a blocking run
+        """
+        self._decoder = None
+        if not block:
+            if self.json or self.json_stream:
+                self._decoder = IPerf3ReportDecoder(
+                    callback=callback, logger=self._logger
+                )
+                self._stdout = self._decoder
+            else:
+                self._stdout = Queue()
+
+        ret = super().profile(block=block)
+        if not block:
+            return ret
+
+        ret = self._format_output(ret)
+        if self._decoder is not None and self._decoder.error is not None:
+            raise ChildProcessError(f'iperf3 error: {self._decoder.error}')
+        return ret
+
+    @property
+    def decoder(self) -> typing.Union[IPerf3ReportDecoder, None]:
+        """the decoder of the JSON output of the last run, which holds the `start_info`,
+        `summary`, and `error` reported by iperf3 (or None without JSON output)"""
+        return getattr(self, '_decoder', None)
+
+    def read_stdout(self):
+        """retreive the output of a background run since the last call.
 
-class LocalIPerf2(LocalIPerfBase, IPerf2Values):
+        Returns:
+            a DataFrame of the interval reports with JSON output, otherwise text
+        """
+        if isinstance(self._stdout, IPerf3ReportDecoder):
+            # intervals are decoded as each line arrives
+            return self._stdout.read()
+        return self._format_output(super().read_stdout())
+
+    def _format_output(self, stdout):
+        """decode JSON output into a pandas DataFrame if self.json or self.json_stream"""
+        if not (self.json or self.json_stream):
+            return stdout.decode() if isinstance(stdout, bytes) else stdout
+
+        self._decoder = IPerf3ReportDecoder(logger=self._logger)
+        self._decoder.feed(stdout)
+        return self._decoder.read()
+
+
+class _IPerf2ReportMixIn(IPerf2Values):
+    """iperf2 report formatting shared by local and remote runs"""
+
+    report_style: str = attr.value.str(
+        default='C',
+        key='-y',
+        only=('C', None),
+        allow_none=True,
+        help='"C" for DataFrame table output, None for formatted text',
+    )
+
+    def _start_report_parser(self, callback=None):
+        """parse reports of the next background run as each line arrives"""
+        if self.report_style is None:
+            self._stdout = Queue()
+        else:
+            self._stdout = IPerf2ReportParser(
+                udp=self.udp,
+                interval=self.interval,
+                callback=callback,
+                logger=self._logger,
+            )
+
+    def _format_output(self, stdout):
+        """pack stdout into a pandas DataFrame if self.report_style == 'C'"""
+
+        if self.report_style is None:
+            return stdout.decode() if isinstance(stdout, bytes) else stdout
+
+        parser = IPerf2ReportParser(udp=self.udp, interval=self.interval, logger=self._logger)
+        parser.feed(stdout)
+        return parser.read()
+
+
+class LocalIPerf2(LocalIPerfBase, _IPerf2ReportMixIn):
     """Run an instance of iperf to profile data transfer speed. It can
     operate as a server (listener) or client (sender), operating either
     in the foreground or as a background thread.
@@ -313,15 +427,20 @@ class LocalIPerf2(LocalIPerfBase, IPerf2Values):
     bidirectional: bool = attr.value.bool(
         default=False, key='-d', help='send and receive simultaneously'
     )
-    report_style: str = attr.value.str(
-        default='C',
-        key='-y',
-        only=('C', None),
-        allow_none=True,
-        help='"C" for DataFrame table output, None for formatted text',
-    )
 
-    def profile(self, block=True):
+    def profile(self, block=True, callback=None):
+        """run iperf.
+
+        Arguments:
+            block: if True, wait for iperf to finish and return its output; otherwise, run it in the background
+            callback: None, or (for background runs with report_style='C') a callable `callback(row: dict)` that receives each report as it is parsed
+
+        Returns:
+            the output (if block is True), formatted according to `report_style`
+        """
+        if not block:
+            self._start_report_parser(callback)
+
         ret = super().profile(block=block)
         if block:
             return self._format_output(ret)
@@ -329,50 +448,18 @@ class LocalIPerf2(LocalIPerfBase, IPerf2Values):
             return ret
 
     def read_stdout(self):
-        """retreive text from standard output. parse into a pandas DataFrame if self.report_style is None"""
-        return self._format_output(super().read_stdout())
-
-    def _format_output(self, stdout):
-        """pack stdout into a pandas DataFrame if self.report_style == 'C'"""
-
-        if self.report_style is None:
-            return stdout.decode()
-
-        # otherwise a dataframe
-        columns = (
-            'timestamp',
-            'source_address',
-            'source_port',
-            'destination_address',
-            'destination_port',
-            'test_id',
-            'interval',
-            'transferred_bytes',
-            'bits_per_second',
-        )
+        """retreive the output of a background run since the last call.
 
-        if self.udp:
-            columns = columns + self.DATAFRAME_COLUMNS
-
-        if isinstance(stdout, bytes):
-            stdout_buf = StringIO(stdout.decode())
-        else:
-            stdout_buf = StringIO(stdout)
-
-        data = pd.read_csv(stdout_buf, header=None, index_col=False, names=columns)
-
-        if data.shape[1] > 0:
-            data.drop(
-                ['interval', 'transferred_bytes', 'test_id'], inplace=True, axis=1
-            )
-        data['timestamp'] = pd.to_datetime(data['timestamp'], format='%Y%m%d%H%M%S')
-        frac_sec = (data.index * self.interval) % 1
-        data['timestamp'] = data['timestamp'] + pd.TimedeltaIndex(frac_sec, 's')
-
-        return data
+        Returns:
+            a DataFrame of the reports if report_style == 'C', otherwise text
+        """
+        if isinstance(self._stdout, IPerf2ReportParser):
+            # reports are parsed as each line arrives
+            return self._stdout.read()
+        return self._format_output(super().read_stdout())
 
 
-class AdbIPerf2(ShellIPerfBase, IPerf2Values):
+class AdbIPerf2(ShellIPerfBase, _IPerf2ReportMixIn):
     # leave this as a string to avoid validation pitfalls if the host isn't POSIXey
     binary_name = attr.value.str('adb', inherit=True)
     remote_binary_path = attr.value.str(
@@ -381,20 +468,36 @@ class AdbIPerf2(ShellIPerfBase, IPerf2Values):
         help='copy destination for iperf in the handset',
     )
 
-    def profile(self, block=True):
+    def profile(self, block=True, callback=None):
+        """run iperf on the handset.
+
+        Arguments:
+            block: if True, wait for iperf to finish and return its output; otherwise, run it in the background
+            callback: None, or (for background runs with report_style='C') a callable `callback(row: dict)` that receives each report as it is parsed
+
+        Returns:
+            the output (if block is True), formatted according to `report_style`
+        """
+        if not block:
+            self._start_report_parser(callback)
+
         ret = super().profile(
             self.binary_path, 'shell', self.remote_binary_path, block=block
         )
 
         if block:
             return self._format_output(ret)
+
+        # wait for output before returning
+        if isinstance(self._stdout, IPerf2ReportParser):
+            self._stdout.wait(1, timeout=self.timeout)
+            test = '\n'.join(self._stdout.messages)
         else:
-            # wait for output before returning
-            test = self.read_stdout(1)
-            if 'network' in test:
-                self._logger.warning('no network connectivity in UE')
+            test = lb.ShellBackend.read_stdout(self, wait_for=1)
+        if 'network' in test:
+            self._logger.warning('no network connectivity in UE')
 
-            return ret
+        return ret
 
     def open(self):
         self.wait_for_device(30)
@@ -467,16 +570,20 @@ class AdbIPerf2(ShellIPerfBase, IPerf2Values):
         """adb seems to forward stderr as stdout. Filter out some undesired
         resulting status messages.
         """
+        if isinstance(self._stdout, IPerf2ReportParser):
+            # reports are parsed as each line arrives, and status messages are logged
+            return self._stdout.read()
+
         txt = lb.ShellBackend.read_stdout(self)
 
         # remove extra output added by adb
         out = []
         for line in txt.splitlines():
-            if b':' not in line:
+            if ':' not in line:
                 out.append(line)
             else:
                 self._logger.warning('stdout: {}'.format(repr(line)))
-        out = b'\n'.join(out)
+        out = '\n'.join(out)
 
         return self._format_output(out)
 
@@ -624,7 +731,13 @@ class LocalIPerf2Pair(LocalIPerf2):
 
         return client.merge(server, how='outer', on='timestamp')
 
-    def _setup_pair(self, **kws):
+    def _setup_pair(self, ports: typing.Union[PortAllocator, None] = None, **kws):
+        """create and open the client and server.
+
+        Arguments:
+            ports: None to check the host for free ports, or an allocator that assigns them from a shared snapshot
+            kws: client parameter values to override for this run (e.g., `time=0` for background runs)
+        """
         if self.running():
             raise BlockingIOError(f'{self} is already running')
 
@@ -645,20 +758,291 @@ class LocalIPerf2Pair(LocalIPerf2):
 
         # override with client/server specifics
         client.client = self.client
-        client.bind = f'{self.client}:{find_free_port()}'
         client.server = False
-        client.check_ports()
 
         server.client = None
         server.bind = self.server
         server.server = True
         server.time = None
         server.number = None
-        server.check_ports()
+
+        for name, value in kws.items():
+            setattr(client, name, value)
+
+        if ports is None:
+            client.bind = f'{self.client}:{find_free_port()}'
+            client.check_ports()
+            server.check_ports()
+        else:
+            client.port = server.port = ports.allocate(self.port)
+            client.bind = f'{self.client}:{ports.allocate()}'
 
         self.backend = lb.sequentially(server, client).__enter__()
 
 
+class LocalIPerf2PairGroup:
+    """Run several :class:`LocalIPerf2Pair` links at the same time.
+
+    The ports for every pair are assigned from a single snapshot of the ports in use
+    on the host, instead of scanning the host connections for each client and server.
+    All servers are started first. The clients are then launched from a pool of worker
+    threads, either released together (`stagger=0`), or at intervals of `stagger`
+    seconds in the order of `pairs`. The launch time of each client is recorded for
+    :meth:`start_skew`.
+
+    Example::
+
+        links = {
+            'wifi': LocalIPerf2Pair(client='10.0.0.2', server='10.0.0.3', time=10, interval=0.5),
+            'lte': LocalIPerf2Pair(client='10.0.1.2', server='10.0.1.3', time=10, interval=0.5),
+        }
+
+        with LocalIPerf2PairGroup(links) as group:
+            data = group.profile()
+        print(data['aggregate'])
+        print(group.start_skew())
+
+    Arguments:
+        pairs: mapping of names to pairs, or a sequence of pairs (named by their index)
+        stagger: the delay between client launches (in s), or 0 to launch all clients together
+        min_port: the lowest port to assign to servers and clients
+        max_port: the highest port to assign to servers and clients
+    """
+
+    def __init__(
+        self,
+        pairs: typing.Union[dict, list],
+        stagger: float = 0,
+        min_port: int = 1024,
+        max_port: int = 65535,
+    ):
+        if stagger < 0:
+            raise ValueError('stagger must be non-negative')
+
+        if not isinstance(pairs, dict):
+            pairs = {str(i): pair for i, pair in enumerate(pairs)}
+        if len(pairs) == 0:
+            raise ValueError('pairs must include at least one LocalIPerf2Pair')
+        self.pairs: dict[str, LocalIPerf2Pair] = dict(pairs)
+        self.stagger = stagger
+        self.min_port = min_port
+        self.max_port = max_port
+
+        self.ports = None
+        self._executor = None
+        self._context = None
+        self._start_times = {}
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return f'{type(self).__name__}({list(self.pairs)!r})'
+
+    def open(self):
+        """Open any closed pairs concurrently."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        closed = [pair for pair in self.pairs.values() if not pair.isopen]
+        if len(closed) > 0:
+            self._context = lb.concurrently(*closed)
+            self._context.__enter__()
+
+        self._executor = ThreadPoolExecutor(
+            len(self.pairs), thread_name_prefix=type(self).__name__
+        )
+
+        # finish the delayed pandas import here, instead of concurrently in the workers
+        pd.DataFrame
+
+    def close(self):
+        try:
+            self.kill()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+            if self._context is not None:
+                self._context.__exit__(None, None, None)
+                self._context = None
+
+    def kill(self):
+        for pair in self.pairs.values():
+            if pair.isopen:
+                pair.kill()
+
+    def running(self) -> bool:
+        return any(pair.running() for pair in self.pairs.values())
+
+    def profile(self, block: bool = True) -> typing.Union[dict, DataFrameType, None]:
+        """Run every pair.
+
+        Arguments:
+            block: if True, wait for all clients to finish and return their output; otherwise, run them in the background
+
+        Returns:
+            the output (if block is True), in the format of :meth:`read_stdout`
+        """
+        if self._executor is None:
+            raise ConnectionError(f'{self!r} is not open')
+        if self.running():
+            raise BlockingIOError(f'{self} is already running')
+
+        try:
+            return self._run(block)
+        except BaseException:
+            # leave no servers or clients running after a failed launch
+            self.kill()
+            raise
+
+    def read_stdout(self) -> typing.Union[dict, DataFrameType]:
+        """Return the output of every pair since the last call.
+
+        Returns:
+            With report_style='C', a DataFrame indexed by report timestamp (rounded
+            to the report interval, if it is set). Its columns have a level for each
+            pair name, holding the numeric report fields of the merged client and
+            server output. The 'aggregate' columns are the sums of
+            'client_bits_per_second' and 'server_bits_per_second' across pairs.
+            Otherwise, a dictionary of text outputs keyed by pair name.
+        """
+        return self._align(
+            {name: pair.read_stdout() for name, pair in self.pairs.items()}
+        )
+
+    def _run(self, block: bool):
+        from concurrent.futures import wait
+
+        self._setup_pairs(block)
+
+        for pair in self.pairs.values():
+            pair.children['server'].profile(block=False)
+
+        t0 = None
+
+        def set_t0():
+            nonlocal t0
+            t0 = perf_counter()
+
+        # release all workers at once, then launch on schedule relative to t0
+        barrier = Barrier(len(self.pairs), action=set_t0)
+        abort = Event()
+
+        def launch(i, name):
+            pair = self.pairs[name]
+            barrier.wait()
+            delay = t0 + i * self.stagger - perf_counter()
+            if delay > 0:
+                abort.wait(delay)
+            if abort.is_set():
+                return None
+            self._start_times[name] = perf_counter()
+            return pair.children['client'].profile(block=block)
+
+        self._start_times = {}
+        futures = {
+            name: self._executor.submit(launch, i, name)
+            for i, name in enumerate(self.pairs)
+        }
+
+        try:
+            client_output = {name: future.result() for name, future in futures.items()}
+        except BaseException:
+            # stop the launches that have not started, and end the ones that have
+            abort.set()
+            barrier.abort()
+            self.kill()
+            wait(futures.values())
+            raise
+
+        if not block:
+            return None
+
+        try:
+            outputs = {
+                name: pair.read_stdout(client_ret=client_output[name])
+                for name, pair in self.pairs.items()
+            }
+        finally:
+            self.kill()
+
+        return self._align(outputs)
+
+    def start_skew(self) -> DataFrameType:
+        """Return the client launch timing of the last run.
+
+        The columns are 'scheduled', the planned launch time of each client, and
+        'start_skew', the actual launch time, both relative to the first launch (in s).
+        """
+        if len(self._start_times) > 0:
+            first = min(self._start_times.values())
+            skew = {name: t - first for name, t in self._start_times.items()}
+        else:
+            skew = {}
+
+        df = pd.DataFrame(
+            {
+                'scheduled': [i * self.stagger for i in range(len(self.pairs))],
+                'start_skew': pd.Series(skew, dtype=float),
+            },
+            index=list(self.pairs),
+        )
+        df.index.name = 'Pair'
+        return df
+
+    def _setup_pairs(self, block: bool = True):
+        """assign ports to all pairs from one snapshot, and create their clients and servers"""
+        if block:
+            kws = {}
+        else:
+            # run until killed, as in LocalIPerf2Pair.profile(block=False)
+            kws = dict(time=0, number=-1)
+
+        try:
+            occupied = get_ipv4_occupied_ports()
+        except psutil.AccessDenied:
+            lb.logger.warning(
+                'need administrator privileges on this platform to check for port access contention'
+            )
+            occupied = ()
+
+        self.ports = PortAllocator(occupied, self.min_port, self.max_port)
+
+        for pair in self.pairs.values():
+            pair._setup_pair(ports=self.ports, **kws)
+
+    def _align(self, outputs: dict) -> typing.Union[dict, DataFrameType]:
+        tables = {
+            name: data
+            for name, data in outputs.items()
+            if isinstance(data, pd.DataFrame)
+        }
+        if len(tables) < len(outputs):
+            return outputs
+
+        columns = {}
+        for name, data in tables.items():
+            data = data.set_index('timestamp')
+            interval = self.pairs[name].interval
+            if interval is not None and len(data) > 0:
+                data.index = data.index.round(pd.Timedelta(seconds=interval))
+            columns[name] = data.select_dtypes('number').groupby(level=0).mean()
+
+        df = pd.concat(columns, axis=1, names=['Pair', 'Field']).sort_index()
+
+        aggregate = {}
+        for field in ('client_bits_per_second', 'server_bits_per_second'):
+            if field in df.columns.get_level_values('Field'):
+                matches = df.xs(field, axis=1, level='Field')
+                aggregate[('aggregate', field)] = matches.sum(axis=1, min_count=1)
+
+        return pd.concat([df, pd.DataFrame(aggregate, index=df.index)], axis=1)
+
+
 m1 = 0x5555555555555555
 m2 = 0x3333333333333333
 m4 = 0x0F0F0F0F0F0F0F0F